@@ -17,9 +17,10 @@ sys.path.insert(0, str(project_root))
 # 导入自定义模块
 try:
     from src.crawler.core import DocCrawler
+    from src.crawler.batch import load_manifest, run_batch
+    from src.crawler.resources import CrawlResources, DEFAULT_MAX_CONCURRENCY, DEFAULT_HOST_CONCURRENCY, DEFAULT_LLM_CONCURRENCY
     from src.config.settings import load_all_configs, config_check_passed, LOG_FILE, LOG_DIR, ensure_env_loaded
-    from src.utils.url import get_urls_from_sitemap
-    from src.utils.file import ensure_directory_exists
+    from src.utils.file import ensure_directory_exists, get_output_subdir
 except ImportError as e:
     print(f"致命错误: 无法导入必要的模块。请确保项目结构正确。详情: {e}")
     sys.exit(1)
@@ -33,76 +34,132 @@ async def run_crawler(args):
     logger.info(f"爬虫开始处理，时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     logger.info(f"参数: {args}")
 
+    # 输出根目录放在与 'logs' 同级的位置
+    output_base_dir = os.path.dirname(LOG_DIR)
+
+    if args.mode == 'batch':
+        logger.info(f"模式: batch - 按清单批量爬取: {args.url}")
+        defaults = {
+            'doc_type': args.doc_type,
+            'focus': args.focus,
+            'tool_name': args.tool_name,
+            'max_pages': args.max_pages,
+            'min_delay': args.min_delay,
+            'max_delay': args.max_delay,
+            'respect_robots_txt': not args.ignore_robots,  # 注意取反
+        }
+        sites = load_manifest(args.url, defaults)
+        if not sites:
+            logger.error("清单中没有可处理的站点。")
+            return
+        report = await run_batch(
+            sites,
+            output_base_dir=output_base_dir,
+            max_concurrency=args.max_concurrency,
+            host_concurrency=args.host_concurrency,
+            llm_concurrency=args.llm_concurrency,
+            batch_token_budget=args.batch_token_budget,
+            small_page_tokens=args.small_page_tokens,
+            max_pages_per_batch=args.max_pages_per_batch,
+            robots_ttl=args.robots_ttl * 3600,
+            max_in_flight=args.max_in_flight,
+            max_page_chars=args.max_page_chars,
+            max_rss_mb=args.max_rss_mb,
+            max_retries=args.max_retries,
+            circuit_threshold=args.circuit_threshold,
+            circuit_cooldown=args.circuit_cooldown,
+            fast_model=args.fast_model,
+            heavy_model=args.heavy_model,
+            route_token_threshold=args.route_token_threshold,
+            route_complexity_threshold=args.route_complexity_threshold
+        )
+        logger.info(f"批量处理完成: {report['sites_total']} 个站点，失败 {report['sites_failed']} 个，保存 {report['pages_saved']} 个页面")
+        logger.info(f"峰值内存: {report['memory']['peak_memory_mb']} MB ({report['memory']['memory_source']})")
+        logger.info(f"LLM 模型用量: {report['llm_models']}")
+        logger.info(f"永久失败的 URL: {len(report['fetch_health']['failed_urls'])} 个，不可用主机: {report['fetch_health']['dead_hosts']}")
+        logger.info(f"运行报告: {report['report_path']}")
+        logger.info(f"爬虫处理完成，耗时 {time.time() - start_time:.2f} 秒。")
+        logger.info(f"日志文件位置: {LOG_FILE}")
+        return
+
     # 创建基于文档类型的输出目录
-    output_subdir = f"{args.doc_type}"
-    if args.focus: output_subdir += f"_focus-{args.focus.replace(' ', '_')}"
-    if args.tool_name: output_subdir += f"_tool-{args.tool_name.replace(' ', '_')}"
-    
-    # 设置输出目录
-    output_base_dir = os.path.dirname(LOG_DIR)  # 将输出目录放在与 'logs' 同级的位置
-    output_dir = os.path.join(output_base_dir, 'output', output_subdir)
+    output_dir = os.path.join(output_base_dir, 'output', get_output_subdir(args.doc_type, args.focus, args.tool_name))
     ensure_directory_exists(output_dir)
     logger.info(f"输出目录: {output_dir}")
 
-    # 初始化爬虫实例
-    crawler = DocCrawler(
-        doc_type=args.doc_type,
-        focus=args.focus,
-        tool_name=args.tool_name,
-        max_pages=args.max_pages,
-        respect_robots_txt=not args.ignore_robots,  # 注意取反
-        rate_limit_delay=(args.min_delay, args.max_delay)
-    )
-
-    urls_to_process: List[str] = []
-
-    if args.mode == 'count':
-        logger.info(f"模式: count - 统计相关 URL 数量: {args.url}")
-        await crawler.count_crawlable_urls(args.url)
-    elif args.mode == 'process':
-        logger.info(f"模式: process - 爬取并处理内部链接: {args.url}")
-        
-        # 1. 尝试从网站地图获取 URL
-        logger.info(f"尝试从网站地图获取 URL: {args.url}...")
-        sitemap_urls = await get_urls_from_sitemap(args.url)
-
-        if sitemap_urls:
-            logger.info(f"在网站地图中找到 {len(sitemap_urls)} 个 URL。使用这些 URL 进行处理。")
-            urls_to_process = sitemap_urls[:args.max_pages]  # 限制页面数量
-        else:
-            logger.warning("网站地图获取失败。回退到爬取初始页面的链接。")
-            # 2. 回退: 从初始页面获取内部链接
-            internal_urls, base_domain, _ = await crawler.get_internal_links(args.url)
-            if not internal_urls:
-                logger.error("从初始页面也没有找到内部链接。退出。")
-                return
-            logger.info(f"通过爬取找到 {len(internal_urls)} 个内部链接。使用这些链接进行处理。")
-            urls_to_process = internal_urls[:args.max_pages]  # 限制页面数量
-
-        if not urls_to_process:
-            logger.error("没有要处理的 URL。")
-            return
-
-        # 处理收集到的 URL
-        processed_results = await crawler.crawl_and_process_internal_links(
-            urls_to_process,
-            output_dir=output_dir,
+    async with CrawlResources(max_concurrency=args.max_concurrency,
+                              host_concurrency=args.host_concurrency,
+                              llm_concurrency=args.llm_concurrency,
+                              rate_limit_delay=(args.min_delay, args.max_delay),
+                              batch_token_budget=args.batch_token_budget,
+                              small_page_tokens=args.small_page_tokens,
+                              max_pages_per_batch=args.max_pages_per_batch,
+                              robots_ttl=args.robots_ttl * 3600,
+                              max_in_flight=args.max_in_flight,
+                              max_page_chars=args.max_page_chars,
+                              max_rss_mb=args.max_rss_mb,
+                              max_retries=args.max_retries,
+                              circuit_threshold=args.circuit_threshold,
+                              circuit_cooldown=args.circuit_cooldown,
+                              fast_model=args.fast_model,
+                              heavy_model=args.heavy_model,
+                              route_token_threshold=args.route_token_threshold,
+                              route_complexity_threshold=args.route_complexity_threshold) as resources:
+        # 初始化爬虫实例
+        crawler = DocCrawler(
+            doc_type=args.doc_type,
+            focus=args.focus,
+            tool_name=args.tool_name,
             max_pages=args.max_pages,
-            min_delay=args.min_delay,
-            max_delay=args.max_delay
+            respect_robots_txt=not args.ignore_robots,  # 注意取反
+            rate_limit_delay=(args.min_delay, args.max_delay),
+            resources=resources
         )
-        
-        # 输出处理结果
-        for result in processed_results:
-            if result:  # 过滤掉None值
-                logger.info(f"URL: {result['url']} -> 文件: {result['output']}")
-    else:
-        # 由于 argparse 的 choices 参数，这种情况应该不会发生
-        logger.error(f"指定了无效的模式: {args.mode}")
+
+        if args.mode == 'count':
+            logger.info(f"模式: count - 统计相关 URL 数量: {args.url}")
+            await crawler.count_crawlable_urls(args.url)
+        elif args.mode == 'process':
+            logger.info(f"模式: process - 爬取并处理内部链接: {args.url}")
+            
+            # 优先从网站地图获取 URL，失败则回退到初始页面的内部链接
+            urls_to_process: List[str] = await crawler.collect_urls(args.url, max_pages=args.max_pages)
+
+            if not urls_to_process:
+                if crawler.robots_unreachable_reason(args.url):
+                    logger.error("robots.txt 无法访问，没有处理任何 URL。")
+                else:
+                    logger.error("没有要处理的 URL。")
+                return
+
+            # 处理收集到的 URL
+            processed_results = await crawler.crawl_and_process_internal_links(
+                urls_to_process,
+                output_dir=output_dir,
+                max_pages=args.max_pages,
+                min_delay=args.min_delay,
+                max_delay=args.max_delay
+            )
+            
+            # 输出处理结果
+            for result in processed_results:
+                if result:  # 过滤掉None值
+                    logger.info(f"URL: {result['url']} -> 文件: {result['output']}")
+            if resources.page_batcher is not None:
+                logger.info(f"LLM 小页面打包统计: {resources.page_batcher.stats}")
+            logger.info(f"LLM 模型用量: {resources.model_router.summary()}")
+            # 输出最终失败的 URL
+            for failure in resources.health.failed_urls:
+                logger.warning(f"抓取失败: {failure['url']}，原因: {failure['reason']}")
+        else:
+            # 由于 argparse 的 choices 参数，这种情况应该不会发生
+            logger.error(f"指定了无效的模式: {args.mode}")
 
     end_time = time.time()
     duration = end_time - start_time
     logger.info(f"爬虫处理完成，耗时 {duration:.2f} 秒。")
+    memory_stats = resources.memory_watchdog.summary()
+    logger.info(f"峰值内存: {memory_stats['peak_memory_mb']} MB ({memory_stats['memory_source']})")
     logger.info(f"日志文件位置: {LOG_FILE}")
     logger.info(f"输出文件位置: {output_dir}")
 
@@ -115,8 +172,8 @@ def main():
     parser = argparse.ArgumentParser(description="简易文档爬虫")
     
     # 核心参数
-    parser.add_argument("url", help="要爬取的起始网址")
-    parser.add_argument("mode", choices=['count', 'process'], help="操作模式：'count' 统计内部链接数量，'process' 爬取并处理页面")
+    parser.add_argument("url", help="要爬取的起始网址（batch 模式下为站点清单 JSON 文件路径）")
+    parser.add_argument("mode", choices=['count', 'process', 'batch'], help="操作模式：'count' 统计内部链接数量，'process' 爬取并处理页面，'batch' 按清单并发处理多个站点")
     parser.add_argument("--doc_type", default="general", help="文档类型（如 'tutorial', 'api_reference', 'general'），用于选择关键词/提示词")
 
     # 内容处理参数（仅 'process' 模式需要）
@@ -124,11 +181,30 @@ def main():
     parser.add_argument("--focus", help="可选：指定 LLM 抽取时关注的内容（如 '安装步骤'、'认证方式' 等）")
     parser.add_argument("--tool_name", help="可选：文档中涉及的具体工具或库名")
 
+    # 模型路由参数
+    parser.add_argument("--fast_model", default=os.getenv("FAST_MODEL", "deepseek-ai/DeepSeek-V3"), help="小而简单的页面使用的快速模型（默认读取环境变量 FAST_MODEL）")
+    parser.add_argument("--heavy_model", default=os.getenv("HEAVY_MODEL", "Pro/deepseek-ai/DeepSeek-R1"), help="大或复杂的页面使用的推理模型（默认读取环境变量 HEAVY_MODEL）")
+    parser.add_argument("--route_token_threshold", type=int, default=1500, help="页面内容预估 token 数超过该值时使用推理模型")
+    parser.add_argument("--route_complexity_threshold", type=int, default=3, help="页面复杂度（代码块、表格、标题数量）达到该值时使用推理模型")
+
     # 爬取行为参数
     parser.add_argument("--max_pages", type=int, default=20, help="最多爬取并处理多少个内部页面")
     parser.add_argument("--min_delay", type=float, default=1.0, help="每次请求的最小延时（秒）")
     parser.add_argument("--max_delay", type=float, default=3.0, help="每次请求的最大延时（秒）")
+    parser.add_argument("--max_concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY, help="所有站点共享的最大同时抓取数")
+    parser.add_argument("--host_concurrency", type=int, default=DEFAULT_HOST_CONCURRENCY, help="同一主机的最大同时抓取数，应小于 --max_concurrency")
+    parser.add_argument("--llm_concurrency", type=int, default=DEFAULT_LLM_CONCURRENCY, help="同时进行的 LLM 请求数")
+    parser.add_argument("--batch_token_budget", type=int, default=4000, help="小页面打包为一个 LLM 请求时的 token 预算（页面输入加预计输出），0 表示不打包")
+    parser.add_argument("--max_pages_per_batch", type=int, default=8, help="单个打包请求最多包含的页面数")
+    parser.add_argument("--small_page_tokens", type=int, default=500, help="内容低于该 token 数的页面参与打包")
+    parser.add_argument("--max_in_flight", type=int, default=20, help="同时存在的页面处理任务上限")
+    parser.add_argument("--max_page_chars", type=int, default=200000, help="每个页面抓取后保留的最大字符数，超出部分被截断")
+    parser.add_argument("--max_rss_mb", type=float, default=0, help="内存阈值，单位 MB（容器内为 cgroup 工作集，否则为本进程及浏览器子进程的 PSS 之和），超过后暂停抓取直到回落；0 表示不限制")
+    parser.add_argument("--max_retries", type=int, default=3, help="超时、429、5xx 等暂时性抓取错误的最大重试次数")
+    parser.add_argument("--circuit_threshold", type=int, default=5, help="同一主机连续失败多少次后暂停该主机（断路器打开）")
+    parser.add_argument("--circuit_cooldown", type=float, default=60.0, help="断路器打开后暂停该主机的秒数，之后发送探测请求")
     parser.add_argument("--ignore_robots", action="store_true", help="忽略 robots.txt 规则（谨慎使用，需尊重网站政策）")
+    parser.add_argument("--robots_ttl", type=float, default=24.0, help="robots.txt 磁盘缓存有效期（小时）")
     
     # 日志控制参数
     parser.add_argument("--quiet", action="store_true", help="安静模式，控制台只显示错误信息")
@@ -0,0 +1,86 @@
+# src/api/model_router.py
+import re
+import logging
+from typing import Any, Dict
+
+logger = logging.getLogger('doc_crawler_api')
+
+_CODE_FENCE_PATTERN = re.compile(r'^\s*```', re.MULTILINE)
+_TABLE_ROW_PATTERN = re.compile(r'^\s*\|', re.MULTILINE)
+_HEADING_PATTERN = re.compile(r'^#{1,6}\s', re.MULTILINE)
+
+def estimate_complexity(content: str) -> int:
+    """
+    粗略估算页面结构复杂度：代码块数 + 每 5 行表格记 1 + 每 5 个标题记 1
+
+    只统计位于行首的代码围栏，提示词模板中行内提到的 ``` 不计入。
+    """
+    if not content:
+        return 0
+    code_blocks = len(_CODE_FENCE_PATTERN.findall(content)) // 2
+    table_rows = len(_TABLE_ROW_PATTERN.findall(content))
+    headings = len(_HEADING_PATTERN.findall(content))
+    return code_blocks + table_rows // 5 + headings // 5
+
+class ModelRouter:
+    """
+    按页面内容大小和复杂度选择模型，并累计每个模型的 token 和耗时
+    """
+    def __init__(self,
+                 fast_model: str,
+                 heavy_model: str,
+                 token_threshold: int = 1500,
+                 complexity_threshold: int = 3):
+        """
+        Args:
+            fast_model: 小而简单的页面使用的快速模型
+            heavy_model: 大或复杂的页面使用的推理模型
+            token_threshold: 页面内容预估 token 数超过该值时使用 heavy_model
+            complexity_threshold: 复杂度达到该值时使用 heavy_model
+        """
+        self.fast_model = fast_model
+        self.heavy_model = heavy_model
+        self.token_threshold = token_threshold
+        self.complexity_threshold = complexity_threshold
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    def choose(self, content_tokens: int, complexity: int) -> str:
+        """根据页面内容的预估 token 数和复杂度选择模型"""
+        if content_tokens > self.token_threshold or complexity >= self.complexity_threshold:
+            return self.heavy_model
+        return self.fast_model
+
+    def record(self, model: str, estimated_tokens: int, usage: Dict[str, Any], success: bool = True) -> None:
+        """
+        记录一次请求
+
+        Args:
+            model: 使用的模型
+            estimated_tokens: 发送前预估的提示词 token 数
+            usage: request_completion 返回的用量（prompt_tokens、completion_tokens、latency）
+            success: 请求是否成功
+        """
+        stats = self.stats.setdefault(model, {
+            'requests': 0,
+            'failures': 0,
+            'estimated_prompt_tokens': 0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'latency': 0.0,
+        })
+        stats['requests'] += 1
+        if not success:
+            stats['failures'] += 1
+        stats['estimated_prompt_tokens'] += estimated_tokens
+        stats['prompt_tokens'] += usage.get('prompt_tokens') or 0
+        stats['completion_tokens'] += usage.get('completion_tokens') or 0
+        stats['latency'] += usage.get('latency') or 0.0
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """返回每个模型的累计统计，用于运行报告"""
+        result = {}
+        for model, stats in self.stats.items():
+            result[model] = dict(stats)
+            result[model]['latency'] = round(stats['latency'], 2)
+            result[model]['avg_latency'] = round(stats['latency'] / stats['requests'], 2) if stats['requests'] else 0.0
+        return result
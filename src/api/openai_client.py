@@ -2,10 +2,13 @@
 import os
 import logging
 from openai import AsyncOpenAI
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 
 logger = logging.getLogger('doc_crawler_api')
 
+# 默认使用的模型
+DEFAULT_MODEL = "Pro/deepseek-ai/DeepSeek-R1"
+
 # 全局客户端实例
 _openai_client = None
 
@@ -29,10 +32,59 @@ def get_openai_client() -> AsyncOpenAI:
     
     return _openai_client
 
+import time
 import random
 import asyncio
+from contextlib import nullcontext
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的 token 数：CJK 字符按每字 1 个 token，其余字符按每 4 个字符 1 个 token
+    """
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if '\u4e00' <= ch <= '\u9fff')
+    return cjk + (len(text) - cjk + 3) // 4
+
+async def request_completion(prompt: str,
+                             model: str = DEFAULT_MODEL,
+                             llm_semaphore: Optional[asyncio.Semaphore] = None,
+                             system: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    发送一条用户消息（可带系统提示词）并返回模型输出和用量
+    
+    Args:
+        prompt: 用户消息内容
+        model: 使用的模型名称
+        llm_semaphore: 可选的并发控制信号量
+        system: 可选的系统提示词，放在消息最前面以保持稳定前缀
+    Returns:
+        (模型输出内容, 用量)，用量包含 prompt_tokens、completion_tokens 和 latency（秒）
+    Raises:
+        ValueError: 响应为空或格式无效
+    """
+    client = get_openai_client()
+    messages = []
+    if system:
+        messages.append({"role": "system", "content": system})
+    messages.append({"role": "user", "content": prompt})
+    async with (llm_semaphore or nullcontext()):
+        start_time = time.monotonic()
+        resp = await client.chat.completions.create(
+            model=model,
+            messages=messages
+        )
+        latency = time.monotonic() - start_time
+    if not resp.choices or not resp.choices[0].message or not resp.choices[0].message.content:
+        raise ValueError(f"LLM 响应格式无效或内容为空。响应: {resp}")
+    usage = getattr(resp, 'usage', None)
+    return resp.choices[0].message.content, {
+        'prompt_tokens': getattr(usage, 'prompt_tokens', None),
+        'completion_tokens': getattr(usage, 'completion_tokens', None),
+        'latency': latency,
+    }
 
-async def optimize_markdown(markdown_content: str, instruction: str, model: str = "Pro/deepseek-ai/DeepSeek-R1", llm_semaphore: asyncio.Semaphore = asyncio.Semaphore(1)) -> Optional[str]:
+async def optimize_markdown(markdown_content: str, instruction: str, model: str = DEFAULT_MODEL, llm_semaphore: asyncio.Semaphore = asyncio.Semaphore(1)) -> Optional[str]:
     """
     使用 OpenAI API 优化和翻译 Markdown 内容，并限制并发，增加请求延迟，防止被封/反爬
     
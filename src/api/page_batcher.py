@@ -0,0 +1,229 @@
+# src/api/page_batcher.py
+import re
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.api.openai_client import estimate_tokens
+from src.api.model_router import estimate_complexity
+
+logger = logging.getLogger('doc_crawler_api')
+
+# 批量请求中每个页面的起止标记
+PAGE_START = "<<<PAGE {id}>>>"
+PAGE_END = "<<<END {id}>>>"
+PAGE_BLOCK_PATTERN = re.compile(r'<<<PAGE (\d+)>>>\s*(.*?)\s*<<<END \1>>>', re.DOTALL)
+MARKER_PATTERN = re.compile(r'<<<(?:PAGE|END) \d+>>>')
+
+# 每个页面的起止标记在输入和输出中各占用的大致 token 数
+MARKER_TOKENS = 10
+
+BATCH_INSTRUCTION = (
+    "下面包含 {count} 个相互独立的页面，每个页面以 <<<PAGE 编号>>> 开始、以 <<<END 编号>>> 结束。"
+    "请分别按上述要求处理每个页面，并在输出中用完全相同的标记包裹对应页面的结果，"
+    "不要合并、省略或新增页面，标记之外不要输出任何内容。"
+)
+
+def build_batch_prompt(instruction: str, contents: List[str]) -> str:
+    """
+    将多个页面内容打包为一条带分隔标记的提示词
+
+    Args:
+        instruction: 单页面时使用的指令
+        contents: 各页面内容，编号按列表顺序从 1 开始
+    Returns:
+        批量提示词
+    """
+    parts = [instruction, BATCH_INSTRUCTION.format(count=len(contents)), ""]
+    for index, content in enumerate(contents, start=1):
+        parts.append(PAGE_START.format(id=index))
+        parts.append(content)
+        parts.append(PAGE_END.format(id=index))
+    return "\n".join(parts)
+
+def split_batch_response(response: str, count: int) -> Dict[int, str]:
+    """
+    按分隔标记拆分批量响应，只返回通过校验的页面输出
+
+    校验规则：编号在 1..count 范围内、只出现一次、内容非空且不包含嵌套标记。
+
+    Args:
+        response: 模型的批量输出
+        count: 批量中的页面数量
+    Returns:
+        {页面编号: 输出内容}
+    """
+    outputs: Dict[int, str] = {}
+    duplicated = set()
+    for match in PAGE_BLOCK_PATTERN.finditer(response or ""):
+        page_id = int(match.group(1))
+        content = match.group(2).strip()
+        if page_id < 1 or page_id > count:
+            continue
+        if page_id in outputs:
+            duplicated.add(page_id)
+            continue
+        if not content or MARKER_PATTERN.search(content):
+            continue
+        outputs[page_id] = content
+    for page_id in duplicated:
+        outputs.pop(page_id, None)
+    return outputs
+
+class _PendingBatch:
+    def __init__(self):
+        self.contents: List[str] = []
+        self.routes: List[Tuple[int, int]] = []
+        self.futures: List[asyncio.Future] = []
+        self.tokens = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+class PageBatcher:
+    """
+    将小页面打包进同一个 LLM 请求，减少请求次数和重复的指令 token
+
+    相同指令的小页面会被累积到同一批次，达到 token 预算、页面数上限或等待超时后发送；
+    拆分失败或校验未通过的页面回退为单页面请求。
+    token 预算同时覆盖页面输入和预计的输出，避免批量响应超出模型输出上限被截断。
+    """
+    def __init__(self,
+                 send: Callable[..., Awaitable[str]],
+                 token_budget: int = 4000,
+                 small_page_tokens: int = 500,
+                 max_wait: float = 2.0,
+                 max_pages_per_batch: int = 8,
+                 output_ratio: float = 1.5):
+        """
+        Args:
+            send: 发送一条提示词并返回模型输出的协程函数，调用方式为
+                send(prompt, system, route_tokens=..., route_complexity=...)，
+                后两个参数是用于模型路由的页面 token 数和复杂度（打包时取各页面最大值）
+            token_budget: 单个批量请求中页面输入加预计输出的 token 上限
+            small_page_tokens: 低于该 token 数的页面才参与打包
+            max_wait: 批次从收到第一个页面起最多等待的秒数
+            max_pages_per_batch: 单个批量请求最多包含的页面数
+            output_ratio: 预计输出 token 数与输入 token 数之比（重构后的中文文档通常比原文长）
+        """
+        self.send = send
+        self.token_budget = token_budget
+        self.small_page_tokens = small_page_tokens
+        self.max_wait = max_wait
+        self.max_pages_per_batch = max_pages_per_batch
+        self.output_ratio = output_ratio
+        self._pending: Dict[Tuple[Optional[str], str], _PendingBatch] = {}
+        self._tasks = set()
+        self.stats = {'batch_requests': 0, 'batched_pages': 0, 'single_requests': 0, 'fallback_pages': 0}
+
+    def accepts(self, content: str) -> bool:
+        """判断页面是否足够小，可以参与打包"""
+        return estimate_tokens(content) <= self.small_page_tokens
+
+    def page_cost(self, content: str) -> int:
+        """页面在批量请求中占用的预算：输入 token、预计输出 token 和起止标记"""
+        tokens = estimate_tokens(content)
+        return int(tokens * (1 + self.output_ratio)) + 2 * MARKER_TOKENS
+
+    async def submit(self,
+                     instruction: str,
+                     content: str,
+                     system: Optional[str] = None,
+                     route_tokens: Optional[int] = None,
+                     route_complexity: Optional[int] = None) -> str:
+        """
+        提交一个页面，返回该页面的模型输出
+
+        Args:
+            instruction: 位于页面内容之前的指令，相同指令和系统提示词的页面才会被打包到一起
+            content: 页面内容
+            system: 可选的系统提示词
+            route_tokens: 用于模型路由的页面 token 数（如截断前的原始大小），默认按 content 估算
+            route_complexity: 用于模型路由的页面复杂度，默认按 content 估算
+        Returns:
+            该页面的模型输出
+        """
+        key = (system, instruction)
+        route = (estimate_tokens(content) if route_tokens is None else route_tokens,
+                 estimate_complexity(content) if route_complexity is None else route_complexity)
+        if not self.accepts(content):
+            return await self._send_single(key, content, route)
+
+        tokens = self.page_cost(content)
+        batch = self._pending.get(key)
+        if batch is not None and batch.tokens + tokens > self.token_budget:
+            self._flush_later(key)
+            batch = None
+        if batch is None:
+            batch = _PendingBatch()
+            self._pending[key] = batch
+            batch.timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush_later, key)
+
+        future = asyncio.get_running_loop().create_future()
+        batch.contents.append(content)
+        batch.routes.append(route)
+        batch.futures.append(future)
+        batch.tokens += tokens
+        if batch.tokens >= self.token_budget or len(batch.contents) >= self.max_pages_per_batch:
+            self._flush_later(key)
+        return await future
+
+    def _flush_later(self, key: Tuple[Optional[str], str]) -> None:
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.create_task(self._flush(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush_all(self) -> None:
+        """立即发送所有未满的批次并等待完成"""
+        for key in list(self._pending):
+            self._flush_later(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _send_single(self, key: Tuple[Optional[str], str], content: str, route: Tuple[int, int]) -> str:
+        system, instruction = key
+        self.stats['single_requests'] += 1
+        return await self.send(f"{instruction}{content}", system, route_tokens=route[0], route_complexity=route[1])
+
+    async def _flush(self, key: Tuple[Optional[str], str], batch: _PendingBatch) -> None:
+        system, instruction = key
+        if len(batch.contents) == 1:
+            await self._resolve_single(key, batch.contents[0], batch.routes[0], batch.futures[0])
+            return
+
+        outputs: Dict[int, str] = {}
+        try:
+            self.stats['batch_requests'] += 1
+            response = await self.send(build_batch_prompt(instruction, batch.contents), system,
+                                       route_tokens=max(tokens for tokens, _ in batch.routes),
+                                       route_complexity=max(complexity for _, complexity in batch.routes))
+            outputs = split_batch_response(response, len(batch.contents))
+        except Exception as e:
+            logger.warning(f"批量 LLM 请求失败，回退为单页面请求: {e}")
+
+        fallbacks = []
+        for index, (content, route, future) in enumerate(zip(batch.contents, batch.routes, batch.futures), start=1):
+            if future.done():  # 提交方已取消
+                continue
+            if index in outputs:
+                self.stats['batched_pages'] += 1
+                future.set_result(outputs[index])
+            else:
+                self.stats['fallback_pages'] += 1
+                fallbacks.append(self._resolve_single(key, content, route, future))
+        if fallbacks:
+            logger.info(f"批量响应中 {len(fallbacks)}/{len(batch.contents)} 个页面未通过校验，回退为单页面请求")
+            await asyncio.gather(*fallbacks)
+
+    async def _resolve_single(self, key: Tuple[Optional[str], str], content: str, route: Tuple[int, int], future: asyncio.Future) -> None:
+        try:
+            result = await self._send_single(key, content, route)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
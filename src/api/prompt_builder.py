@@ -0,0 +1,81 @@
+# src/api/prompt_builder.py
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger('doc_crawler_api')
+
+# 内容占位符在模板中的名称
+CONTENT_PLACEHOLDER = 'html_content'
+_CONTENT_MARKER = '\x00'
+
+# prompts.json 缺失时使用的提示词
+FALLBACK_SYSTEM = "你是一个专业的文档优化助手，擅长将技术文档转换为结构化的中文内容。"
+FALLBACK_INSTRUCTION = "请将以下内容转换为结构化的中文markdown文档。直接输出内容，不要使用```markdown标记来包裹内容，因为输出将保存到.md文件中:\n"
+
+class ExtractionPrompt:
+    """
+    渲染后的抽取提示词
+
+    system 和 instruction 对同一站点的所有页面保持不变，页面内容只出现在用户消息末尾，
+    使每个请求都以相同前缀开头，便于服务端复用提示词缓存。
+    """
+    def __init__(self, system: str, instruction: str):
+        """
+        Args:
+            system: 系统提示词
+            instruction: 用户消息中位于页面内容之前的固定部分
+        """
+        self.system = system
+        self.instruction = instruction
+
+    def render(self, content: str) -> str:
+        """生成包含页面内容的用户消息"""
+        return f"{self.instruction}{content}"
+
+def build_extraction_prompt(prompts: Dict[str, Any],
+                            keywords: Optional[List[str]] = None,
+                            focus: Optional[str] = None,
+                            tool_name: Optional[str] = None) -> ExtractionPrompt:
+    """
+    使用 prompts.json 中的 extraction 模板渲染提示词
+
+    Args:
+        prompts: 提示词配置（ALL_PROMPTS）
+        keywords: 文档类型对应的关键词
+        focus: 关注点
+        tool_name: 工具名称
+    Returns:
+        渲染后的提示词，模板缺失时使用内置提示词
+    """
+    extraction = prompts.get('extraction') if prompts else None
+    if not extraction or 'user_template' not in extraction:
+        logger.warning("未找到 extraction 提示词模板，使用内置提示词")
+        return ExtractionPrompt(FALLBACK_SYSTEM, FALLBACK_INSTRUCTION)
+
+    if focus:
+        focus_instruction = extraction.get('focus_template', '{focus}').format(focus=focus)
+    else:
+        focus_instruction = extraction.get('default_focus', '')
+    tool_instruction = extraction.get('tool_template', '{tool_name}').format(tool_name=tool_name) if tool_name else ''
+
+    template = extraction['user_template']
+    lines = template if isinstance(template, list) else [template]
+    values = {
+        'focus_instruction': focus_instruction,
+        'tool_instruction': tool_instruction,
+        'keywords': ', '.join(keywords or []),
+        CONTENT_PLACEHOLDER: _CONTENT_MARKER,
+    }
+    # 逐行渲染，跳过渲染后为空的行（如未指定工具名时的工具行）
+    rendered = [line.format(**values) for line in lines]
+    user_message = '\n'.join(line for line in rendered if line.strip())
+
+    # 页面内容始终放在最后；模板中位于内容占位符之后的文字移到内容之前，保持前缀稳定
+    before, _, after = user_message.partition(_CONTENT_MARKER)
+    if after.strip():
+        instruction = f"{before.rstrip()}\n{after.strip()}\n\n"
+    elif _CONTENT_MARKER in user_message:
+        instruction = before
+    else:
+        instruction = user_message + '\n\n'
+    return ExtractionPrompt(extraction.get('system', FALLBACK_SYSTEM), instruction)
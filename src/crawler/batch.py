@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from src.api.openai_client import DEFAULT_MODEL
+from src.crawler.core import DocCrawler
+from src.crawler.resources import CrawlResources, DEFAULT_MAX_CONCURRENCY, DEFAULT_HOST_CONCURRENCY, DEFAULT_LLM_CONCURRENCY
+from src.utils.file import ensure_directory_exists, get_output_subdir, save_json_to_file
+
+logger = logging.getLogger('doc_crawler_batch')
+
+# 清单中每个站点可覆盖的字段
+SITE_FIELDS = ('doc_type', 'focus', 'tool_name', 'max_pages', 'min_delay', 'max_delay', 'respect_robots_txt')
+
+def load_manifest(manifest_path: str, defaults: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    加载批量爬取清单
+
+    清单为 JSON 文件，可以是站点列表，也可以是包含 "sites" 列表的对象。
+    每个站点至少包含 "url"，其余字段（doc_type、focus、tool_name、max_pages 等）缺省时使用命令行参数。
+
+    Args:
+        manifest_path: 清单文件路径
+        defaults: 各字段的默认值
+    Returns:
+        合并默认值后的站点配置列表
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    entries = manifest.get('sites', []) if isinstance(manifest, dict) else manifest
+    sites = []
+    for index, entry in enumerate(entries):
+        if isinstance(entry, str):
+            entry = {'url': entry}
+        if not isinstance(entry, dict) or not entry.get('url'):
+            logger.warning(f"清单第 {index + 1} 项缺少 url，已跳过: {entry}")
+            continue
+        site = {'url': entry['url']}
+        for field in SITE_FIELDS:
+            site[field] = entry.get(field, defaults.get(field))
+        sites.append(site)
+
+    logger.info(f"从清单 {manifest_path} 加载了 {len(sites)} 个站点")
+    return sites
+
+async def crawl_site(site: Dict[str, Any], resources: CrawlResources, output_base_dir: str) -> Dict[str, Any]:
+    """
+    使用共享资源爬取并处理单个站点
+
+    Args:
+        site: 站点配置
+        resources: 共享运行资源
+        output_base_dir: 输出根目录
+    Returns:
+        该站点的运行报告
+    """
+    start_time = time.time()
+    output_dir = os.path.join(output_base_dir, 'output', get_output_subdir(site['doc_type'], site['focus'], site['tool_name']))
+    report = {
+        'url': site['url'],
+        'doc_type': site['doc_type'],
+        'focus': site['focus'],
+        'tool_name': site['tool_name'],
+        'output_dir': output_dir,
+        'urls_found': 0,
+        'pages_saved': 0,
+        'outputs': [],
+        'failed_urls': [],
+        'error': None,
+    }
+
+    try:
+        ensure_directory_exists(output_dir)
+        crawler = DocCrawler(
+            doc_type=site['doc_type'],
+            focus=site['focus'],
+            tool_name=site['tool_name'],
+            max_pages=site['max_pages'],
+            respect_robots_txt=site['respect_robots_txt'],
+            rate_limit_delay=(site['min_delay'], site['max_delay']),
+            resources=resources
+        )
+        urls_to_process = await crawler.collect_urls(site['url'])
+        report['urls_found'] = len(urls_to_process)
+        if not urls_to_process:
+            robots_reason = crawler.robots_unreachable_reason(site['url'])
+            report['error'] = f"robots.txt 无法访问: {robots_reason}" if robots_reason else "没有要处理的 URL"
+        else:
+            processed_results = await crawler.crawl_and_process_internal_links(
+                urls_to_process,
+                output_dir=output_dir,
+                max_pages=site['max_pages'],
+                min_delay=site['min_delay'],
+                max_delay=site['max_delay']
+            )
+            report['pages_saved'] = len(processed_results)
+            report['outputs'] = [{'url': r['url'], 'output': r['output']} for r in processed_results]
+            site_urls = set(urls_to_process)
+            report['failed_urls'] = [f for f in resources.health.failed_urls if f['url'] in site_urls]
+    except Exception as e:
+        logger.error(f"站点处理失败: {site['url']}, 错误: {e}", exc_info=True)
+        report['error'] = str(e)
+
+    report['duration'] = round(time.time() - start_time, 2)
+    logger.info(f"站点完成: {site['url']}，保存 {report['pages_saved']}/{report['urls_found']} 个页面，耗时 {report['duration']} 秒")
+    return report
+
+async def run_batch(sites: List[Dict[str, Any]],
+                    output_base_dir: str,
+                    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                    host_concurrency: int = DEFAULT_HOST_CONCURRENCY,
+                    llm_concurrency: int = DEFAULT_LLM_CONCURRENCY,
+                    batch_token_budget: int = 4000,
+                    small_page_tokens: int = 500,
+                    max_pages_per_batch: int = 8,
+                    robots_ttl: float = 86400,
+                    max_in_flight: int = 20,
+                    max_page_chars: int = 200000,
+                    max_rss_mb: float = 0,
+                    max_retries: int = 3,
+                    circuit_threshold: int = 5,
+                    circuit_cooldown: float = 60.0,
+                    fast_model: str = DEFAULT_MODEL,
+                    heavy_model: str = DEFAULT_MODEL,
+                    route_token_threshold: int = 1500,
+                    route_complexity_threshold: int = 3,
+                    report_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    并发爬取清单中的所有站点，共享浏览器、HTTP 连接和 LLM 限流，并写出合并的运行报告
+
+    Args:
+        sites: load_manifest 返回的站点配置列表
+        output_base_dir: 输出根目录
+        max_concurrency: 所有站点共享的最大同时抓取数
+        host_concurrency: 同一主机的最大同时抓取数
+        llm_concurrency: 同时进行的 LLM 请求数
+        batch_token_budget: 小页面打包请求的 token 预算（输入加预计输出），为 0 时不打包
+        small_page_tokens: 低于该 token 数的页面参与打包
+        max_pages_per_batch: 单个打包请求最多包含的页面数
+        robots_ttl: robots.txt 磁盘缓存有效期（秒）
+        max_in_flight: 同时存在的页面处理任务上限
+        max_page_chars: 每个页面抓取后保留的最大字符数
+        max_rss_mb: 内存阈值（MB，容器内为 cgroup 工作集，否则为进程树 PSS 之和），超过后暂停抓取，为 0 时不限制
+        max_retries: 暂时性抓取错误的最大重试次数
+        circuit_threshold: 主机连续失败多少次后打开断路器
+        circuit_cooldown: 断路器打开后的冷却时间（秒）
+        fast_model: 小而简单的页面使用的模型
+        heavy_model: 大或复杂的页面使用的模型
+        route_token_threshold: 页面内容预估 token 数超过该值时使用 heavy_model
+        route_complexity_threshold: 内容复杂度达到该值时使用 heavy_model
+        report_path: 报告文件路径，默认写到 output/batch_report_<时间戳>.json
+    Returns:
+        合并的运行报告
+    """
+    start_time = time.time()
+    started_at = datetime.now()
+
+    async with CrawlResources(max_concurrency=max_concurrency,
+                              host_concurrency=host_concurrency,
+                              llm_concurrency=llm_concurrency,
+                              batch_token_budget=batch_token_budget,
+                              small_page_tokens=small_page_tokens,
+                              max_pages_per_batch=max_pages_per_batch,
+                              robots_ttl=robots_ttl,
+                              max_in_flight=max_in_flight,
+                              max_page_chars=max_page_chars,
+                              max_rss_mb=max_rss_mb,
+                              max_retries=max_retries,
+                              circuit_threshold=circuit_threshold,
+                              circuit_cooldown=circuit_cooldown,
+                              fast_model=fast_model,
+                              heavy_model=heavy_model,
+                              route_token_threshold=route_token_threshold,
+                              route_complexity_threshold=route_complexity_threshold) as resources:
+        site_reports = await asyncio.gather(*(crawl_site(site, resources, output_base_dir) for site in sites))
+    batching_stats = dict(resources.page_batcher.stats) if resources.page_batcher is not None else None
+
+    report = {
+        'started_at': started_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'duration': round(time.time() - start_time, 2),
+        'max_concurrency': max_concurrency,
+        'host_concurrency': host_concurrency,
+        'llm_concurrency': llm_concurrency,
+        'sites_total': len(site_reports),
+        'sites_failed': sum(1 for r in site_reports if r['error']),
+        'pages_saved': sum(r['pages_saved'] for r in site_reports),
+        'llm_batching': batching_stats,
+        'llm_models': resources.model_router.summary(),
+        'memory': resources.memory_watchdog.summary(),
+        'fetch_health': resources.health.summary(),
+        'sites': site_reports,
+    }
+
+    if report_path is None:
+        report_path = os.path.join(output_base_dir, 'output', f"batch_report_{started_at.strftime('%Y%m%d_%H%M%S')}.json")
+    save_json_to_file(report, report_path)
+    report['report_path'] = report_path
+    return report
@@ -1,6 +1,7 @@
 import os
 import logging
 import asyncio
+from contextlib import asynccontextmanager
 from typing import Dict, Any, Optional, List, Set, Tuple
 from urllib.parse import urlparse, urljoin
 
@@ -9,10 +10,14 @@ from crawl4ai import AsyncWebCrawler, RateLimiter, BrowserConfig, CrawlResult, C
 from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
 
 # 导入自定义模块
-from src.api.openai_client import optimize_markdown
+from src.api.openai_client import optimize_markdown, estimate_tokens
+from src.api.model_router import estimate_complexity
 from src.utils.file import get_valid_filename, save_markdown_to_file
-from src.utils.url import normalize_url, is_same_domain
-from src.config.settings import ALL_KEYWORDS
+from src.utils.url import normalize_url, is_same_domain, get_urls_from_sitemap, get_sitemap_url
+from src.crawler.resources import CrawlResources
+from src.crawler.robots import RobotsCache
+from src.api.prompt_builder import ExtractionPrompt, build_extraction_prompt
+from src.config import settings
 
 # 默认排除的 HTML 标签
 DEFAULT_EXCLUDED_TAGS = ['header', 'footer', 'nav', 'aside', 'script', 'style', 'form', 'iframe', 'button', 'input', 'select', 'textarea']
@@ -33,112 +38,211 @@ class DocCrawler:
             logger.info(f"内部链接: {link}")
         return len(internal_links)
 
+    async def collect_urls(self, url: str, max_pages: Optional[int] = None) -> List[str]:
+        """
+        收集待处理的 URL：优先使用网站地图，失败时回退到初始页面的内部链接
+        Args:
+            url: 起始 URL
+            max_pages: 最多返回的 URL 数量，默认使用 self.max_pages
+        Returns:
+            待处理的 URL 列表
+        """
+        max_pages = max_pages or self.max_pages
+
+        # 1. 尝试从网站地图获取 URL
+        logger.info(f"尝试从网站地图获取 URL: {url}...")
+        sitemap_urls = []
+        if await self._robots_allowed(get_sitemap_url(url)):
+            session = self.resources.http_session if self.resources else None
+            sitemap_urls = await self._filter_robots(await get_urls_from_sitemap(url, session=session))
+        if sitemap_urls:
+            logger.info(f"在网站地图中找到 {len(sitemap_urls)} 个 URL。使用这些 URL 进行处理。")
+            return sitemap_urls[:max_pages]  # 限制页面数量
+
+        logger.warning("网站地图获取失败。回退到爬取初始页面的链接。")
+        # 2. 回退: 从初始页面获取内部链接
+        internal_urls, base_domain, _ = await self.get_internal_links(url)
+        internal_urls = await self._filter_robots(internal_urls)
+        if not internal_urls:
+            reason = self.robots_unreachable_reason(url)
+            if reason:
+                logger.error(f"robots.txt 无法访问，无法确定允许抓取的 URL: {reason}")
+            else:
+                logger.error("从初始页面也没有找到内部链接。")
+            return []
+        logger.info(f"通过爬取找到 {len(internal_urls)} 个内部链接。使用这些链接进行处理。")
+        return internal_urls[:max_pages]  # 限制页面数量
+
+    async def _robots_allowed(self, url: str) -> bool:
+        """按 robots.txt 判断 URL 是否允许抓取，未启用 respect_robots_txt 时总是允许"""
+        if not self.respect_robots_txt:
+            return True
+        return await self.robots.allowed(url)
+
+    def robots_unreachable_reason(self, url: str) -> Optional[str]:
+        """站点的 robots.txt 无法访问导致全部禁止时返回原因，否则返回 None"""
+        if not self.respect_robots_txt:
+            return None
+        return self.robots.unreachable_reason(url)
+
+    async def _filter_robots(self, urls: List[str]) -> List[str]:
+        """在加入抓取队列前过滤掉 robots.txt 禁止的 URL"""
+        if not self.respect_robots_txt or not urls:
+            return urls
+        return await self.robots.filter_allowed(urls)
+
+    @asynccontextmanager
+    async def _use_resources(self):
+        """
+        获取运行资源：优先使用外部传入的共享资源，否则为本次调用临时创建并在结束时关闭
+        """
+        if self.resources is not None:
+            yield self.resources
+            return
+        async with CrawlResources(rate_limit_delay=self.rate_limit_delay, robots=self.robots) as resources:
+            yield resources
+
     async def crawl_and_process_internal_links(self, urls, output_dir, max_pages=20, min_delay=1.0, max_delay=3.0, extraction_strategy=None):
         """
         爬取并处理所有传入的内部链接，内容优化后保存为markdown文件
         :param urls: 需要处理的内部链接列表（字符串URL）
         :param output_dir: 输出目录
         :param max_pages: 最大处理页面数
-        :param min_delay: 最小延迟（秒）
-        :param max_delay: 最大延迟（秒）
+        :param min_delay: 同一主机两次请求之间的最小延迟（秒）
+        :param max_delay: 同一主机两次请求之间的最大延迟（秒）
         :param extraction_strategy: crawl4ai的内容抽取策略（如LLMExtractionStrategy），可选
         :return: 处理结果列表
         """
-        import os
-        import asyncio
-        import time
-        from crawl4ai import AsyncWebCrawler, CrawlerRunConfig
+        from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
+        from crawl4ai.content_filter_strategy import PruningContentFilter
         
         # 只处理前max_pages个链接
         urls = urls[:max_pages]
         os.makedirs(output_dir, exist_ok=True)
         results = []
-        sem = asyncio.Semaphore(3)  # 控制并发数
-
-        async def process_one(url):
-            async with sem:
-                await asyncio.sleep(min_delay)
-                try:
-                    # 配置CrawlerRunConfig，启用fit.markdown功能
-                    from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
-                    from crawl4ai.content_filter_strategy import PruningContentFilter
-                    
-                    # 创建markdown生成器，使用PruningContentFilter进行内容过滤
-                    md_generator = DefaultMarkdownGenerator(
-                        content_filter=PruningContentFilter(threshold=0.6),
-                        options={"ignore_links": False, "content_source": "cleaned_html"}
-                    )
-                    
-                    # 创建运行配置
-                    config = CrawlerRunConfig(
-                        extraction_strategy=extraction_strategy if extraction_strategy is not None else None,
-                        markdown_generator=md_generator,
-                        word_count_threshold=100  # 降低阈值，确保捕获更多内容
-                    )
+
+        async def process_one(url, resources):
+            try:
+                # 配置CrawlerRunConfig，启用fit.markdown功能
+                # 创建markdown生成器，使用PruningContentFilter进行内容过滤
+                md_generator = DefaultMarkdownGenerator(
+                    content_filter=PruningContentFilter(threshold=0.6),
+                    options={"ignore_links": False, "content_source": "cleaned_html"}
+                )
+                
+                # 创建运行配置
+                config = CrawlerRunConfig(
+                    extraction_strategy=extraction_strategy if extraction_strategy is not None else None,
+                    markdown_generator=md_generator,
+                    word_count_threshold=100  # 降低阈值，确保捕获更多内容
+                )
+                
+                # 抓取受全局并发预算、每主机礼貌间隔和主机健康状态约束，浏览器实例在所有任务间共享；
+                # 暂时性错误在 fetch_page 内重试，最终失败的 URL 记录到 resources.health
+                crawl_result = await resources.fetch_page(url, config=config, delay=(min_delay, max_delay), holds_task_slot=True)
+                if crawl_result is None:
+                    return None
+                # 优先使用crawl4ai抽取结果，否则用OpenAI优化
+                markdown = getattr(crawl_result, 'extracted_content', None)
+                fit_markdown = None
+                content_to_process = None
+                if not markdown:
+                    # 尝试获取fit_markdown内容（这是crawl4ai的主要内容提取功能）
+                    # 先尝试从 result.markdown 获取 fit_markdown
+                    if hasattr(crawl_result, 'markdown') and hasattr(crawl_result.markdown, 'fit_markdown'):
+                        fit_markdown = crawl_result.markdown.fit_markdown
+                    # 如果上面的方式不成功，尝试直接从 result 获取 fit_markdown
+                    elif hasattr(crawl_result, 'fit_markdown'):
+                        fit_markdown = crawl_result.fit_markdown
                     
-                    async with AsyncWebCrawler() as crawler:
-                        crawl_result = await crawler.arun(url, config=config)
-                        if not crawl_result.success:
-                            logger.warning(f"爬取失败: {url}")
+                    # 如果没有fit_markdown，则尝试其他已过滤的内容
+                    if not fit_markdown:
+                        filtered_content = getattr(crawl_result, 'cleaned_markdown', None) or getattr(crawl_result, 'filtered_content', None)
+                        content_to_process = filtered_content or getattr(crawl_result, 'html', None)
+                        filtered_content = None
+                        if not content_to_process:
+                            logger.warning(f"页面无有效内容: {url}")
                             return None
-                        # 优先使用crawl4ai抽取结果，否则用OpenAI优化
-                        markdown = getattr(crawl_result, 'extracted_content', None)
-                        if not markdown:
-                            # 尝试获取fit_markdown内容（这是crawl4ai的主要内容提取功能）
-                            fit_markdown = None
-                            
-                            # 先尝试从 result.markdown 获取 fit_markdown
-                            if hasattr(crawl_result, 'markdown') and hasattr(crawl_result.markdown, 'fit_markdown'):
-                                fit_markdown = crawl_result.markdown.fit_markdown
-                            # 如果上面的方式不成功，尝试直接从 result 获取 fit_markdown
-                            elif hasattr(crawl_result, 'fit_markdown'):
-                                fit_markdown = crawl_result.fit_markdown
-                            
-                            # 如果没有fit_markdown，则尝试其他已过滤的内容
-                            if not fit_markdown:
-                                filtered_content = getattr(crawl_result, 'cleaned_markdown', None) or getattr(crawl_result, 'filtered_content', None)
-                                content_to_process = filtered_content or getattr(crawl_result, 'html', None)
-                                if not content_to_process:
-                                    logger.warning(f"页面无有效内容: {url}")
-                                    return None
-                            else:
-                                content_to_process = fit_markdown
-                                
-                            # 在控制台输出过滤后的内容，用于调试
-                            # 仅在DEBUG级别时输出详细内容，或者环境变量未设置为禁止输出
-                            if logging.getLogger().isEnabledFor(logging.DEBUG) and os.environ.get('NO_DEBUG_CONTENT') != 'true':
-                                print("\n==== 传递给LLM的过滤后内容（前500字符）====")
-                                print(content_to_process[:500] + ("..." if len(content_to_process) > 500 else ""))
-                                print("==== 过滤后内容结束 ====\n")
-                            
-                            # 用OpenAI API优化内容
-                            from src.api.openai_client import get_openai_client
-                            # 根据内容类型调整提示语
-                            if fit_markdown:
-                                prompt = f"请将以下Markdown内容转换为结构化的中文markdown文档。直接输出内容，不要使用```markdown标记来包裹内容，因为输出将保存到.md文件中:\n{content_to_process[:4000]}"
-                            else:
-                                prompt = f"请将以下HTML内容转换为结构化的中文markdown文档。直接输出内容，不要使用```markdown标记来包裹内容，因为输出将保存到.md文件中:\n{content_to_process[:4000]}"
-                            client = get_openai_client()
-                            resp = await client.chat.completions.create(
-                                model="Pro/deepseek-ai/DeepSeek-R1",
-                                messages=[{"role": "user", "content": prompt}]
-                            )
-                            markdown = resp.choices[0].message.content
-                        # 保存为markdown文件
-                        safe_name = url.replace('://', '_').replace('/', '_').replace('?', '_') + ".md"
-                        out_path = os.path.join(output_dir, safe_name)
-                        with open(out_path, 'w', encoding='utf-8') as f:
-                            f.write(markdown)
-                        logger.info(f"已保存: {out_path}")
-                        return {'url': url, 'output': out_path, 'status': 'success'}
-                except Exception as e:
-                    logger.error(f"处理失败: {url}, 错误: {e}")
-                    return None
-        tasks = [process_one(u) for u in urls]
-        for coro in asyncio.as_completed(tasks):
-            res = await coro
-            if res:
-                results.append(res)
+                    else:
+                        content_to_process = fit_markdown
+
+                # 取出所需文本后立即释放完整抓取结果（原始HTML、cleaned_html等），只保留不超过上限的文本
+                del crawl_result
+                max_page_chars = resources.max_page_chars
+                if markdown and len(markdown) > max_page_chars:
+                    logger.info(f"页面内容超过 {max_page_chars} 字符，已截断: {url}")
+                    markdown = markdown[:max_page_chars]
+
+                if not markdown:
+                    # 模型路由按截断到 4000 字符之前的页面大小和结构判断，否则英文页面的 token 数始终低于路由阈值
+                    content_to_process = content_to_process[:max_page_chars]
+                    route_tokens = estimate_tokens(content_to_process)
+                    route_complexity = estimate_complexity(content_to_process)
+                    content_to_process = content_to_process[:4000]
+                    fit_markdown = None
+                        
+                    # 在控制台输出过滤后的内容，用于调试
+                    # 仅在DEBUG级别时输出详细内容，或者环境变量未设置为禁止输出
+                    if logging.getLogger().isEnabledFor(logging.DEBUG) and os.environ.get('NO_DEBUG_CONTENT') != 'true':
+                        print("\n==== 传递给LLM的过滤后内容（前500字符）====")
+                        print(content_to_process[:500] + ("..." if len(content_to_process) > 500 else ""))
+                        print("==== 过滤后内容结束 ====\n")
+                    
+                    # 用OpenAI API优化内容，提示词由 prompts.json 的 extraction 模板渲染，页面内容放在末尾
+                    prompt = self.get_llm_prompt()
+                    # LLM 请求不占用抓取槽位；小页面交给打包器与其他页面合并为一个请求
+                    if resources.page_batcher is not None:
+                        markdown = await resources.page_batcher.submit(
+                            prompt.instruction,
+                            content_to_process,
+                            system=prompt.system,
+                            route_tokens=route_tokens,
+                            route_complexity=route_complexity
+                        )
+                    else:
+                        markdown = await resources.complete(
+                            prompt.render(content_to_process),
+                            system=prompt.system,
+                            route_tokens=route_tokens,
+                            route_complexity=route_complexity
+                        )
+                    content_to_process = None
+                # 保存为markdown文件
+                safe_name = url.replace('://', '_').replace('/', '_').replace('?', '_') + ".md"
+                out_path = os.path.join(output_dir, safe_name)
+                with open(out_path, 'w', encoding='utf-8') as f:
+                    f.write(markdown)
+                logger.info(f"已保存: {out_path}")
+                return {'url': url, 'output': out_path, 'status': 'success'}
+            except Exception as e:
+                logger.error(f"处理失败: {url}, 错误: {e}")
+                return None
+
+        async def run_bounded(url, resources):
+            try:
+                return await process_one(url, resources)
+            finally:
+                resources.task_slots.release()
+
+        async with self._use_resources() as resources:
+            # 被 robots.txt 禁止的 URL 不进入抓取队列，不占用浏览器渲染
+            urls = await self._filter_robots(urls)
+            # 按共享的任务槽位逐个创建任务，避免一次性为所有 URL 创建协程并同时持有页面内容
+            pending = set()
+            try:
+                for u in urls:
+                    await resources.task_slots.acquire()
+                    pending.add(asyncio.create_task(run_bounded(u, resources)))
+                    done = {task for task in pending if task.done()}
+                    pending -= done
+                    results.extend(task.result() for task in done if task.result())
+                for task in asyncio.as_completed(pending):
+                    res = await task
+                    if res:
+                        results.append(res)
+            finally:
+                for task in pending:
+                    task.cancel()
         return results
 
     def __init__(self,
@@ -147,7 +251,8 @@ class DocCrawler:
                  tool_name: Optional[str] = None,
                  max_pages: int = 20,
                  respect_robots_txt: bool = True,
-                 rate_limit_delay: Tuple[float, float] = (1.0, 3.0)):
+                 rate_limit_delay: Tuple[float, float] = (1.0, 3.0),
+                 resources: Optional[CrawlResources] = None):
         """
         初始化爬虫
         
@@ -158,13 +263,20 @@ class DocCrawler:
             max_pages: 最大爬取页面数
             respect_robots_txt: 是否遵守 robots.txt
             rate_limit_delay: 请求延迟范围 (最小, 最大)
+            resources: 可选的共享运行资源（浏览器、连接、并发限制），批量模式下由多个站点共用
         """
         self.doc_type = doc_type
         self.focus = focus
         self.tool_name = tool_name
         self.max_pages = max_pages
         self.respect_robots_txt = respect_robots_txt
-        self.keywords = ALL_KEYWORDS.get(self.doc_type, [])
+        self.rate_limit_delay = rate_limit_delay
+        self.resources = resources
+        # robots.txt 规则缓存，有共享资源时与其他站点共用
+        self.robots = resources.robots if resources is not None else RobotsCache()
+        # 配置在 load_all_configs 中加载，需通过模块属性读取
+        self.keywords = settings.ALL_KEYWORDS.get(self.doc_type, [])
+        self._llm_prompt: Optional[ExtractionPrompt] = None
         # 降低爬虫并发，增加请求间隔，防止被封/反爬
         self.rate_limiter = RateLimiter(rate_limit_delay[0], rate_limit_delay[1])  # 只传递延迟参数，避免不兼容
         self.processed_urls = set()
@@ -172,6 +284,15 @@ class DocCrawler:
         
         logger.info(f"爬虫初始化完成。文档类型: {doc_type}, 最大页面数: {max_pages}, 延迟: {rate_limit_delay}")
 
+    def get_llm_prompt(self) -> ExtractionPrompt:
+        """
+        获取本站点的抽取提示词：使用文档类型关键词、关注点和工具名渲染 extraction 模板，
+        渲染结果对所有页面相同，只渲染一次
+        """
+        if self._llm_prompt is None:
+            self._llm_prompt = build_extraction_prompt(settings.ALL_PROMPTS, self.keywords, self.focus, self.tool_name)
+        return self._llm_prompt
+
     async def get_internal_links(self, initial_url: str) -> Tuple[List[str], str, str]:
         """
         获取指定页面的所有内部链接
@@ -199,16 +320,17 @@ class DocCrawler:
             return urlparse(base_url).netloc == urlparse(target_url).netloc
 
         try:
-            # 配置爬虫
-            browser_cfg = BrowserConfig(headless=True)
-            async with AsyncWebCrawler(rate_limiter=self.rate_limiter, config=browser_cfg, 
-                                      respect_robots_txt=self.respect_robots_txt) as crawler:
+            # 使用共享浏览器，并与页面抓取共用并发预算和礼貌间隔
+            async with self._use_resources() as resources:
+                if not await self._robots_allowed(initial_url):
+                    logger.error(f"robots.txt 禁止抓取初始 URL: {initial_url}")
+                    return [], base_domain, title
                 logger.info(f"获取初始 URL: {initial_url}")
                 # 爬取初始页面
-                crawl_result = await crawler.arun(initial_url, max_depth=0)
+                crawl_result = await resources.fetch_page(initial_url, delay=self.rate_limit_delay, max_depth=0)
                 
-                if not crawl_result.success:
-                    logger.error(f"爬取初始 URL 失败: {initial_url}, 错误: {crawl_result.error_message}")
+                if crawl_result is None:
+                    logger.error(f"爬取初始 URL 失败: {initial_url}")
                     return [], base_domain, title
                 
                 # 解析 HTML
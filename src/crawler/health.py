@@ -0,0 +1,193 @@
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('doc_crawler_health')
+
+# 可重试的 HTTP 状态码
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+# 错误信息中表示网络或超时问题的片段（小写）
+TRANSIENT_ERROR_MARKERS = (
+    'timeout', 'timed out', 'err_connection', 'err_network', 'err_internet_disconnected',
+    'err_name_not_resolved', 'err_address_unreachable', 'err_timed_out', 'err_empty_response',
+    'connection reset', 'connection refused',
+    'econnreset', 'temporarily unavailable',
+)
+
+# 断路器状态
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class HostUnavailableError(Exception):
+    """主机多次探测失败，被判定为不可用"""
+
+def classify_failure(status_code: Optional[int] = None, error_message: Optional[str] = None, exc: Optional[BaseException] = None) -> bool:
+    """
+    判断一次抓取失败是否为暂时性错误（值得重试）
+
+    Args:
+        status_code: HTTP 状态码
+        error_message: crawl4ai 返回的错误信息
+        exc: 抓取时抛出的异常
+    Returns:
+        暂时性错误返回 True，永久性错误返回 False
+    """
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if status_code in TRANSIENT_STATUS_CODES:
+        return True
+    if status_code is not None and 400 <= status_code < 500:
+        return False
+    message = (error_message or (str(exc) if exc is not None else '')).lower()
+    return any(marker in message for marker in TRANSIENT_ERROR_MARKERS)
+
+class _HostState:
+    def __init__(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_count = 0
+        self.opened_at = 0.0
+        self.dead = False
+        self.probe_done = asyncio.Event()
+
+class HostHealthTracker:
+    """
+    每主机健康状态跟踪与断路器
+
+    连续暂时性失败达到阈值后打开断路器，该主机的任务在冷却期内挂起等待；
+    冷却结束后只放行一个探测请求，成功则关闭断路器，失败则重新打开；
+    连续多次打开后仍失败的主机被判定为不可用，剩余任务直接失败。
+    """
+    def __init__(self,
+                 failure_threshold: int = 5,
+                 cooldown: float = 60.0,
+                 max_open_count: int = 3,
+                 max_retries: int = 3,
+                 backoff_base: float = 2.0,
+                 backoff_max: float = 60.0):
+        """
+        Args:
+            failure_threshold: 打开断路器所需的连续暂时性失败次数
+            cooldown: 断路器打开后的冷却时间（秒）
+            max_open_count: 断路器连续打开多少次后判定主机不可用
+            max_retries: 单个 URL 遇到暂时性错误时的最大重试次数
+            backoff_base: 重试退避的基础秒数，按 2 的指数增长
+            backoff_max: 单次退避的最长秒数
+        """
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_open_count = max_open_count
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._hosts: Dict[str, _HostState] = {}
+        self.failed_urls: List[Dict[str, Any]] = []
+        self.retry_count = 0
+
+    def is_ready(self, host: str) -> bool:
+        """主机断路器关闭、请求可以立即发出时返回 True"""
+        state = self._hosts.get(host)
+        return state is None or (state.state == CLOSED and not state.dead)
+
+    def _host(self, host: str) -> _HostState:
+        if host not in self._hosts:
+            self._hosts[host] = _HostState()
+        return self._hosts[host]
+
+    async def wait_available(self, host: str) -> bool:
+        """
+        等待主机可以接受请求：断路器打开时挂起到冷却结束，半开状态下等待探测结果
+
+        Returns:
+            当前任务被选为探测请求时返回 True，调用方必须在请求结束后调用 end_probe
+        Raises:
+            HostUnavailableError: 主机已被判定为不可用
+        """
+        state = self._host(host)
+        while True:
+            if state.dead:
+                raise HostUnavailableError(f"主机不可用: {host}")
+            if state.state == CLOSED:
+                return False
+            if state.state == OPEN:
+                remaining = state.opened_at + self.cooldown - time.monotonic()
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+                    continue
+                # 冷却结束，由当前任务发出探测请求
+                state.state = HALF_OPEN
+                state.probe_done.clear()
+                logger.info(f"主机 {host} 冷却结束，发送探测请求")
+                return True
+            await state.probe_done.wait()
+
+    def end_probe(self, host: str) -> None:
+        """
+        探测请求结束时调用：如果探测没有记录任何结果（被取消或遇到与主机无关的异常），
+        断路器回到打开状态并唤醒等待的任务，由下一个任务重新探测
+        """
+        state = self._host(host)
+        if state.state == HALF_OPEN:
+            state.state = OPEN
+            logger.info(f"主机 {host} 的探测请求未得到结果，等待重新探测")
+        state.probe_done.set()
+
+    def record_success(self, host: str) -> None:
+        """记录主机有响应（包括永久性错误，如 404），关闭断路器"""
+        state = self._host(host)
+        if state.state != CLOSED:
+            logger.info(f"主机 {host} 恢复正常，关闭断路器")
+        state.state = CLOSED
+        state.consecutive_failures = 0
+        state.open_count = 0
+        state.probe_done.set()
+
+    def record_transient_failure(self, host: str) -> None:
+        """记录一次暂时性失败，必要时打开断路器或判定主机不可用"""
+        state = self._host(host)
+        state.consecutive_failures += 1
+        if state.state == HALF_OPEN or (state.state == CLOSED and state.consecutive_failures >= self.failure_threshold):
+            state.open_count += 1
+            if state.open_count > self.max_open_count:
+                state.dead = True
+                logger.error(f"主机 {host} 多次探测失败，判定为不可用，跳过剩余任务")
+            else:
+                state.state = OPEN
+                state.opened_at = time.monotonic()
+                logger.warning(f"主机 {host} 连续失败 {state.consecutive_failures} 次，断路器打开 {self.cooldown:.0f} 秒")
+            state.probe_done.set()
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """计算第 attempt 次重试前的等待秒数，优先使用服务器的 Retry-After"""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        delay = self.backoff_base * (2 ** attempt)
+        return min(delay + random.uniform(0, self.backoff_base), self.backoff_max)
+
+    def record_permanent_failure(self, url: str, host: str, reason: str, status_code: Optional[int] = None) -> None:
+        """记录最终失败的 URL，用于运行报告"""
+        self.failed_urls.append({'url': url, 'host': host, 'status_code': status_code, 'reason': reason})
+
+    def summary(self) -> Dict[str, Any]:
+        """返回健康统计，用于运行报告"""
+        return {
+            'retries': self.retry_count,
+            'failed_urls': list(self.failed_urls),
+            'dead_hosts': sorted(host for host, state in self._hosts.items() if state.dead),
+            'open_circuits': sorted(host for host, state in self._hosts.items() if state.state != CLOSED and not state.dead),
+        }
+
+def parse_retry_after(headers: Optional[Dict[str, str]]) -> Optional[float]:
+    """从响应头中解析以秒表示的 Retry-After"""
+    if not headers:
+        return None
+    for key, value in headers.items():
+        if key.lower() == 'retry-after':
+            try:
+                return max(float(value), 0.0)
+            except (TypeError, ValueError):
+                return None
+    return None
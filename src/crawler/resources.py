@@ -0,0 +1,326 @@
+import random
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from crawl4ai import AsyncWebCrawler, BrowserConfig
+
+from src.api.openai_client import request_completion, estimate_tokens, DEFAULT_MODEL
+from src.api.model_router import ModelRouter, estimate_complexity
+from src.api.page_batcher import PageBatcher
+from src.crawler.robots import RobotsCache
+from src.crawler.health import HostHealthTracker, HostUnavailableError, classify_failure, parse_retry_after
+from src.utils.memory import MemoryWatchdog
+
+logger = logging.getLogger('doc_crawler_crawler')
+
+# 并发默认值：单主机并发低于全局预算，避免一个慢站点占满所有抓取槽位
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_HOST_CONCURRENCY = 2
+DEFAULT_LLM_CONCURRENCY = 4
+
+class CrawlResources:
+    """
+    爬虫运行期共享资源：浏览器实例、HTTP 连接、全局并发预算、每主机礼貌限速和 LLM 并发限制
+
+    单站点运行和批量运行都通过同一个实例访问这些资源，避免每个站点重复启动浏览器和冷启动连接。
+    """
+    def __init__(self,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 host_concurrency: int = DEFAULT_HOST_CONCURRENCY,
+                 llm_concurrency: int = DEFAULT_LLM_CONCURRENCY,
+                 rate_limit_delay: Tuple[float, float] = (1.0, 3.0),
+                 batch_token_budget: int = 4000,
+                 small_page_tokens: int = 500,
+                 max_pages_per_batch: int = 8,
+                 robots_ttl: float = 86400,
+                 robots: Optional[RobotsCache] = None,
+                 max_in_flight: int = 20,
+                 max_page_chars: int = 200000,
+                 max_rss_mb: float = 0,
+                 max_retries: int = 3,
+                 circuit_threshold: int = 5,
+                 circuit_cooldown: float = 60.0,
+                 fast_model: str = DEFAULT_MODEL,
+                 heavy_model: str = DEFAULT_MODEL,
+                 route_token_threshold: int = 1500,
+                 route_complexity_threshold: int = 3):
+        """
+        Args:
+            max_concurrency: 所有站点共享的最大同时抓取数
+            host_concurrency: 同一主机的最大同时抓取数
+            llm_concurrency: 同时进行的 LLM 请求数
+            rate_limit_delay: 同一主机两次请求之间的默认间隔范围 (最小, 最大)
+            batch_token_budget: 小页面打包请求的 token 预算（输入加预计输出），为 0 时不打包
+            small_page_tokens: 低于该 token 数的页面参与打包
+            max_pages_per_batch: 单个打包请求最多包含的页面数
+            robots_ttl: robots.txt 磁盘缓存有效期（秒）
+            robots: 可选的已有 robots.txt 规则缓存
+            max_in_flight: 同时存在的页面处理任务上限（所有站点共享）
+            max_page_chars: 每个页面抓取后保留的最大字符数，超出部分被截断
+            max_rss_mb: 内存阈值（MB，容器内为 cgroup 工作集，否则为进程树 PSS 之和），超过后暂停抓取，为 0 时不限制
+            max_retries: 暂时性抓取错误的最大重试次数
+            circuit_threshold: 主机连续失败多少次后打开断路器
+            circuit_cooldown: 断路器打开后的冷却时间（秒）
+            fast_model: 小而简单的页面使用的模型
+            heavy_model: 大或复杂的页面使用的模型
+            route_token_threshold: 页面内容预估 token 数超过该值时使用 heavy_model
+            route_complexity_threshold: 内容复杂度达到该值时使用 heavy_model
+        """
+        self.max_concurrency = max_concurrency
+        self.host_concurrency = host_concurrency
+        self.rate_limit_delay = rate_limit_delay
+        self.fetch_semaphore = asyncio.Semaphore(max_concurrency)
+        self.task_slots = asyncio.Semaphore(max_in_flight)
+        self.max_page_chars = max_page_chars
+        self.memory_watchdog = MemoryWatchdog(max_rss_mb=max_rss_mb)
+        self.health = HostHealthTracker(
+            failure_threshold=circuit_threshold,
+            cooldown=circuit_cooldown,
+            max_retries=max_retries
+        )
+        self.llm_semaphore = asyncio.Semaphore(llm_concurrency)
+        self.model_router = ModelRouter(
+            fast_model=fast_model,
+            heavy_model=heavy_model,
+            token_threshold=route_token_threshold,
+            complexity_threshold=route_complexity_threshold
+        )
+        self.page_batcher: Optional[PageBatcher] = None
+        if batch_token_budget > 0:
+            self.page_batcher = PageBatcher(
+                send=self.complete,
+                token_budget=batch_token_budget,
+                small_page_tokens=small_page_tokens,
+                max_pages_per_batch=max_pages_per_batch
+            )
+        self.crawler: Optional[AsyncWebCrawler] = None
+        self.http_session: Optional[requests.Session] = None
+        self.robots = robots or RobotsCache(ttl=robots_ttl)
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._host_last_request: Dict[str, float] = {}
+
+    async def start(self) -> 'CrawlResources':
+        """启动共享浏览器、HTTP 会话和内存监控"""
+        self.memory_watchdog.start()
+        if self.crawler is None:
+            self.crawler = AsyncWebCrawler(config=BrowserConfig(headless=True))
+            await self.crawler.start()
+            logger.debug("共享浏览器已启动")
+        if self.http_session is None:
+            self.http_session = requests.Session()
+            if self.robots.session is None:
+                self.robots.session = self.http_session
+        return self
+
+    async def complete(self,
+                       prompt: str,
+                       system: Optional[str] = None,
+                       route_tokens: Optional[int] = None,
+                       route_complexity: Optional[int] = None) -> str:
+        """
+        在共享 LLM 并发限制下发送一条提示词
+
+        按页面内容的预估 token 数和复杂度选择快速模型或推理模型，并记录该模型的用量和耗时。
+        固定指令和打包后的多个页面不参与路由判断，否则指令本身和多页累加的复杂度会把小页面推给推理模型。
+
+        Args:
+            prompt: 用户消息
+            system: 可选的系统提示词
+            route_tokens: 用于路由的页面内容 token 数（打包时为最大页面的值），默认按整条提示词估算
+            route_complexity: 用于路由的页面复杂度（打包时为最大值），默认按整条提示词估算
+        """
+        estimated_tokens = estimate_tokens(system or '') + estimate_tokens(prompt)
+        if route_tokens is None:
+            route_tokens = estimated_tokens
+        if route_complexity is None:
+            route_complexity = estimate_complexity(prompt)
+        model = self.model_router.choose(route_tokens, route_complexity)
+        logger.debug(f"LLM 请求预估 {estimated_tokens} tokens（路由按 {route_tokens} tokens、复杂度 {route_complexity}），使用模型: {model}")
+        try:
+            content, usage = await request_completion(prompt, model=model, llm_semaphore=self.llm_semaphore, system=system)
+        except Exception:
+            self.model_router.record(model, estimated_tokens, {}, success=False)
+            raise
+        self.model_router.record(model, estimated_tokens, usage)
+        return content
+
+    async def close(self) -> None:
+        """发送剩余的打包请求，并关闭共享浏览器、HTTP 会话和内存监控"""
+        if self.page_batcher is not None:
+            await self.page_batcher.flush_all()
+        await self.memory_watchdog.stop()
+        if self.crawler is not None:
+            try:
+                await self.crawler.close()
+            except Exception as e:
+                logger.warning(f"关闭共享浏览器时出错: {e}")
+            self.crawler = None
+        if self.http_session is not None:
+            if self.robots.session is self.http_session:
+                self.robots.session = None
+            self.http_session.close()
+            self.http_session = None
+
+    async def __aenter__(self) -> 'CrawlResources':
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.host_concurrency)
+        return self._host_semaphores[host]
+
+    async def _wait_host_interval(self, host: str, interval: float) -> None:
+        """等待到该主机上一次请求发出后 interval 秒，不记录本次请求"""
+        last = self._host_last_request.get(host)
+        if last is not None:
+            wait = last + interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+    def _claim_host_interval(self, host: str, interval: float) -> bool:
+        """距该主机上一次请求已满 interval 秒时记录本次请求并返回 True，否则返回 False"""
+        now = time.monotonic()
+        last = self._host_last_request.get(host)
+        if last is not None and now < last + interval:
+            return False
+        self._host_last_request[host] = now
+        return True
+
+    @asynccontextmanager
+    async def fetch_slot(self, url: str, delay: Optional[Tuple[float, float]] = None):
+        """
+        获取一次抓取的许可：先占用主机槽位并等待礼貌间隔，再占用全局槽位，
+        这样排队等待某个主机的任务不会占用全局并发预算。
+        进程内存超过阈值时，在获取全局槽位前暂停，直到内存回落。
+
+        请求时间在拿到全局槽位后才记录：如果等待全局槽位或内存回落期间同一主机已有请求发出，
+        则归还全局槽位重新等待间隔，保证同一主机相邻两次请求确实间隔 delay 范围内的随机时长。
+        如果该主机的 robots.txt 已加载且声明了 Crawl-delay，间隔不少于该值。
+
+        Args:
+            url: 将要抓取的 URL
+            delay: 该站点的请求间隔范围，默认使用 rate_limit_delay
+        """
+        host = urlparse(url).netloc
+        delay = delay or self.rate_limit_delay
+        async with self._host_semaphore(host):
+            polite_interval = random.uniform(delay[0], delay[1])
+            while True:
+                # 每轮重新读取 Crawl-delay，等待期间刚加载或刷新的 robots.txt 规则也会生效
+                interval = max(polite_interval, self.robots.crawl_delay(url) or 0.0)
+                await self._wait_host_interval(host, interval)
+                await self.memory_watchdog.wait_until_ok()
+                await self.fetch_semaphore.acquire()
+                if self._claim_host_interval(host, interval):
+                    break
+                self.fetch_semaphore.release()
+            try:
+                yield
+            finally:
+                self.fetch_semaphore.release()
+
+    @asynccontextmanager
+    async def _parked(self, holds_task_slot: bool):
+        """
+        长时间挂起（断路器冷却、重试退避）期间暂时归还调用方持有的任务槽位，结束后重新获取，
+        避免不可用主机上的任务占满 max_in_flight，阻塞其他站点创建任务
+        """
+        if not holds_task_slot:
+            yield
+            return
+        self.task_slots.release()
+        try:
+            yield
+        finally:
+            # 被取消时也让重新获取在后台完成，保证调用方最终释放槽位时计数平衡
+            await asyncio.shield(self.task_slots.acquire())
+
+    async def fetch_page(self,
+                         url: str,
+                         config=None,
+                         delay: Optional[Tuple[float, float]] = None,
+                         holds_task_slot: bool = False,
+                         **kwargs):
+        """
+        在共享限流和主机健康检查下抓取页面
+
+        状态码 >= 400 的结果即使 success 为 True 也视为失败。
+        暂时性错误（超时、429、5xx 等）按退避重试，永久性错误或重试耗尽时记录到失败列表；
+        断路器打开的主机在冷却期内挂起。挂起和退避期间不占用抓取槽位，
+        调用方持有任务槽位时也会暂时归还。
+
+        Args:
+            url: 要抓取的 URL
+            config: crawl4ai 的 CrawlerRunConfig
+            delay: 该站点的请求间隔范围
+            holds_task_slot: 调用方是否持有 task_slots 槽位
+            **kwargs: 传给 AsyncWebCrawler.arun 的其他参数
+        Returns:
+            成功时返回 CrawlResult，失败时返回 None
+        """
+        host = urlparse(url).netloc
+        for attempt in range(self.health.max_retries + 1):
+            probe = False
+            # 探测请求无论以何种方式结束（包括任务被取消）都要释放半开状态，否则该主机的其他任务会永远等待
+            try:
+                try:
+                    if self.health.is_ready(host):
+                        probe = await self.health.wait_available(host)
+                    else:
+                        async with self._parked(holds_task_slot):
+                            probe = await self.health.wait_available(host)
+                except HostUnavailableError as e:
+                    self.health.record_permanent_failure(url, host, str(e))
+                    logger.warning(f"跳过不可用主机上的 URL: {url}")
+                    return None
+
+                status_code = None
+                retry_after = None
+                try:
+                    async with self.fetch_slot(url, delay=delay):
+                        crawl_result = await self.crawler.arun(url, config=config, **kwargs)
+                    status_code = getattr(crawl_result, 'status_code', None)
+                    # crawl4ai 对返回了 HTML 的 429/503 等错误页也标记为 success，需要结合状态码判断
+                    if crawl_result.success and not (status_code and status_code >= 400):
+                        self.health.record_success(host)
+                        return crawl_result
+                    reason = getattr(crawl_result, 'error_message', None) or f"HTTP {status_code}"
+                    retry_after = parse_retry_after(getattr(crawl_result, 'response_headers', None))
+                    transient = classify_failure(status_code=status_code, error_message=reason)
+                except Exception as e:
+                    reason = str(e) or type(e).__name__
+                    transient = classify_failure(exc=e)
+
+                if not transient:
+                    if status_code is not None:
+                        # 主机有响应，只是该 URL 不可用
+                        self.health.record_success(host)
+                    # 没有 HTTP 状态码的未知异常（如浏览器页面崩溃）不说明主机是否正常，不改变主机健康状态
+                    self.health.record_permanent_failure(url, host, reason, status_code)
+                    logger.warning(f"抓取失败（不重试）: {url}, 原因: {reason}")
+                    return None
+
+                self.health.record_transient_failure(host)
+            finally:
+                if probe:
+                    self.health.end_probe(host)
+
+            if attempt >= self.health.max_retries:
+                break
+            wait = self.health.backoff(attempt, retry_after)
+            self.health.retry_count += 1
+            logger.info(f"抓取暂时失败: {url}, 原因: {reason}，{wait:.1f} 秒后第 {attempt + 1} 次重试")
+            async with self._parked(holds_task_slot):
+                await asyncio.sleep(wait)
+
+        self.health.record_permanent_failure(url, host, f"重试 {self.health.max_retries} 次后仍失败: {reason}", status_code)
+        logger.warning(f"抓取失败（重试耗尽）: {url}, 原因: {reason}")
+        return None
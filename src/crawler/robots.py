@@ -0,0 +1,252 @@
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger('doc_crawler_robots')
+
+# robots.txt 磁盘缓存目录
+ROBOTS_CACHE_DIR = os.path.join(Path(__file__).parent.parent.parent, 'cache', 'robots')
+# robots.txt 无法访问（5xx 或网络错误）时，在内存中保持“全部禁止”的秒数，之后重新获取
+UNREACHABLE_RETRY_SECONDS = 600
+# 获取 robots.txt 的尝试次数和退避基数（秒），第 n 次重试前等待 基数 * 2^(n-1)
+ROBOTS_FETCH_ATTEMPTS = 3
+ROBOTS_RETRY_BACKOFF = 2.0
+
+class RobotsRules:
+    """
+    编译后的 robots.txt 规则：按路径匹配 Allow/Disallow，最长匹配优先，长度相同时 Allow 优先
+    """
+    def __init__(self, rules: Optional[List[Tuple[bool, str]]] = None, crawl_delay: Optional[float] = None, disallow_all: bool = False):
+        """
+        Args:
+            rules: (是否允许, 路径模式) 列表
+            crawl_delay: Crawl-delay（秒）
+            disallow_all: 是否禁止所有路径（robots.txt 无法访问时使用）
+        """
+        self.crawl_delay = crawl_delay
+        self.disallow_all = disallow_all
+        self._matchers = []
+        for allow, pattern in rules or []:
+            if '*' in pattern or pattern.endswith('$'):
+                regex = re.escape(pattern).replace(r'\*', '.*')
+                if regex.endswith(r'\$'):
+                    regex = regex[:-2] + '$'
+                matcher = re.compile(regex).match
+            else:
+                matcher = (lambda prefix: lambda path: path.startswith(prefix))(pattern)
+            self._matchers.append((len(pattern), allow, matcher))
+        # 按模式长度降序、同长度 Allow 优先排序，第一个命中的规则即为结果
+        self._matchers.sort(key=lambda item: (-item[0], not item[1]))
+
+    def allowed(self, url: str) -> bool:
+        """判断 URL 是否允许抓取"""
+        if self.disallow_all:
+            return False
+        parsed = urlparse(url)
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+        if path == '/robots.txt':
+            return True
+        for _, allow, matcher in self._matchers:
+            if matcher(path):
+                return allow
+        return True
+
+def parse_robots_txt(content: str, user_agent: str) -> RobotsRules:
+    """
+    解析 robots.txt 并编译适用于 user_agent 的规则
+
+    选择名称包含在 user_agent 中的最具体的 User-agent 分组，没有则使用 "*" 分组；同名分组会被合并。
+
+    Args:
+        content: robots.txt 文本
+        user_agent: 爬虫的 User-agent 标识
+    Returns:
+        编译后的规则
+    """
+    groups: List[Tuple[List[str], List[Tuple[bool, str]], List[float]]] = []
+    agents: List[str] = []
+    rules: List[Tuple[bool, str]] = []
+    delays: List[float] = []
+    in_rules = False
+
+    for raw_line in content.splitlines():
+        line = raw_line.split('#', 1)[0].strip()
+        if ':' not in line:
+            continue
+        key, value = line.split(':', 1)
+        key = key.strip().lower()
+        value = value.strip()
+        if key == 'user-agent':
+            if in_rules:
+                groups.append((agents, rules, delays))
+                agents, rules, delays = [], [], []
+                in_rules = False
+            agents.append(value.lower())
+        elif key in ('allow', 'disallow'):
+            in_rules = True
+            if agents and value:
+                rules.append((key == 'allow', value))
+        elif key == 'crawl-delay':
+            in_rules = True
+            try:
+                delays.append(float(value))
+            except ValueError:
+                logger.debug(f"无效的 Crawl-delay: {value}")
+    if agents:
+        groups.append((agents, rules, delays))
+
+    user_agent = user_agent.lower()
+    best_len = -1
+    selected_rules: List[Tuple[bool, str]] = []
+    selected_delays: List[float] = []
+    for group_agents, group_rules, group_delays in groups:
+        match_len = max((0 if agent == '*' else len(agent) for agent in group_agents
+                         if agent == '*' or (agent and agent in user_agent)), default=-1)
+        if match_len < 0:
+            continue
+        if match_len > best_len:
+            best_len = match_len
+            selected_rules, selected_delays = list(group_rules), list(group_delays)
+        elif match_len == best_len:
+            selected_rules.extend(group_rules)
+            selected_delays.extend(group_delays)
+
+    return RobotsRules(selected_rules, crawl_delay=max(selected_delays) if selected_delays else None)
+
+class RobotsCache:
+    """
+    robots.txt 规则缓存：每个主机只获取一次 robots.txt，编译后保存在内存中，原文按 TTL 缓存到磁盘
+
+    robots.txt 多次重试后仍无法访问的主机会被暂时全部禁止，并记录在 unreachable 中，
+    以便调用方把站点报告为“robots.txt 无法访问”而不是“没有 URL”。
+    """
+    def __init__(self,
+                 user_agent: str = 'crawl-to-md',
+                 ttl: float = 86400,
+                 cache_dir: str = ROBOTS_CACHE_DIR,
+                 session: Optional[requests.Session] = None):
+        """
+        Args:
+            user_agent: 匹配 robots.txt 分组时使用的 User-agent 标识
+            ttl: 缓存有效期（秒）
+            cache_dir: 磁盘缓存目录
+            session: 可选的共享 HTTP 会话
+        """
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.session = session
+        self._rules: Dict[str, Tuple[RobotsRules, float]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # robots.txt 无法访问的源站 -> 最后一次失败原因
+        self.unreachable: Dict[str, str] = {}
+
+    @staticmethod
+    def _origin(url: str) -> str:
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    def _cache_path(self, origin: str) -> str:
+        return os.path.join(self.cache_dir, re.sub(r'[^\w\-\.]', '_', origin) + '.json')
+
+    def _load_from_disk(self, origin: str) -> Optional[Tuple[RobotsRules, float]]:
+        path = self._cache_path(origin)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            expires_at = cached['fetched_at'] + self.ttl
+            if expires_at <= time.time():
+                return None
+            return parse_robots_txt(cached['content'], self.user_agent), expires_at
+        except Exception as e:
+            logger.debug(f"读取 robots.txt 缓存失败 {path}: {e}")
+            return None
+
+    def _save_to_disk(self, origin: str, status: int, content: str) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self._cache_path(origin), 'w', encoding='utf-8') as f:
+                json.dump({'url': f"{origin}/robots.txt", 'status': status, 'content': content, 'fetched_at': time.time()}, f, ensure_ascii=False)
+        except Exception as e:
+            logger.debug(f"写入 robots.txt 缓存失败 {origin}: {e}")
+
+    async def _fetch(self, origin: str) -> Tuple[RobotsRules, float]:
+        robots_url = f"{origin}/robots.txt"
+        http = self.session or requests
+        reason = ''
+        for attempt in range(ROBOTS_FETCH_ATTEMPTS):
+            if attempt:
+                wait = ROBOTS_RETRY_BACKOFF * 2 ** (attempt - 1)
+                logger.info(f"获取 {robots_url} 失败: {reason}，{wait:.1f} 秒后第 {attempt} 次重试")
+                await asyncio.sleep(wait)
+            try:
+                response = await asyncio.to_thread(http.get, robots_url, timeout=10)
+            except Exception as e:
+                reason = str(e) or type(e).__name__
+                continue
+            if response.status_code >= 500:
+                reason = f"HTTP {response.status_code}"
+                continue
+
+            self.unreachable.pop(origin, None)
+            # 4xx 视为没有限制
+            content = response.text if response.status_code < 400 else ''
+            self._save_to_disk(origin, response.status_code, content)
+            logger.info(f"已获取 {robots_url} (状态码 {response.status_code})")
+            return parse_robots_txt(content, self.user_agent), time.time() + self.ttl
+
+        self.unreachable[origin] = reason
+        logger.warning(f"{ROBOTS_FETCH_ATTEMPTS} 次尝试后仍无法获取 {robots_url}，暂时禁止抓取该主机: {reason}")
+        return RobotsRules(disallow_all=True), time.time() + UNREACHABLE_RETRY_SECONDS
+
+    async def rules_for(self, url: str) -> RobotsRules:
+        """获取 URL 所在主机的规则，依次查找内存缓存、磁盘缓存，最后联网获取"""
+        origin = self._origin(url)
+        cached = self._rules.get(origin)
+        if cached is not None and cached[1] > time.time():
+            return cached[0]
+
+        lock = self._locks.setdefault(origin, asyncio.Lock())
+        async with lock:
+            cached = self._rules.get(origin)
+            if cached is not None and cached[1] > time.time():
+                return cached[0]
+            cached = self._load_from_disk(origin) or await self._fetch(origin)
+            self._rules[origin] = cached
+            return cached[0]
+
+    async def allowed(self, url: str) -> bool:
+        """判断 URL 是否允许抓取"""
+        rules = await self.rules_for(url)
+        return rules.allowed(url)
+
+    async def filter_allowed(self, urls: List[str]) -> List[str]:
+        """过滤掉 robots.txt 禁止抓取的 URL，保持原有顺序"""
+        allowed_urls = []
+        for url in urls:
+            if await self.allowed(url):
+                allowed_urls.append(url)
+            else:
+                logger.info(f"robots.txt 禁止抓取，已跳过: {url}")
+        return allowed_urls
+
+    def unreachable_reason(self, url: str) -> Optional[str]:
+        """URL 所在主机的 robots.txt 无法访问时返回失败原因，否则返回 None"""
+        return self.unreachable.get(self._origin(url))
+
+    def crawl_delay(self, url: str) -> Optional[float]:
+        """返回已加载规则中的 Crawl-delay，规则尚未加载时返回 None"""
+        cached = self._rules.get(self._origin(url))
+        return cached[0].crawl_delay if cached is not None else None
@@ -1,9 +1,10 @@
 # src/utils/file.py
 import os
 import re
+import json
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Any
 from urllib.parse import urlparse
 
 logger = logging.getLogger('doc_crawler_utils')
@@ -81,3 +82,44 @@ def save_markdown_to_file(content: str, file_path: str) -> bool:
     except Exception as e:
         logger.error(f"u4fddu5b58u5185u5bb9u5230u6587u4ef6u65f6u51fau9519 {file_path}: {e}")
         return False
+
+def get_output_subdir(doc_type: str, focus: Optional[str] = None, tool_name: Optional[str] = None) -> str:
+    """
+    根据文档类型、关注点和工具名生成输出子目录名
+    
+    Args:
+        doc_type: 文档类型
+        focus: 关注点
+        tool_name: 工具名称
+        
+    Returns:
+        输出子目录名
+    """
+    output_subdir = f"{doc_type}"
+    if focus: output_subdir += f"_focus-{focus.replace(' ', '_')}"
+    if tool_name: output_subdir += f"_tool-{tool_name.replace(' ', '_')}"
+    return output_subdir
+
+def save_json_to_file(data: Any, file_path: str) -> bool:
+    """
+    将数据以 JSON 格式保存到文件
+    
+    Args:
+        data: 可 JSON 序列化的数据
+        file_path: 保存路径
+        
+    Returns:
+        是否保存成功
+    """
+    try:
+        directory = os.path.dirname(file_path)
+        ensure_directory_exists(directory)
+        
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        
+        logger.info(f"JSON 已保存到文件: {file_path}")
+        return True
+    except Exception as e:
+        logger.error(f"保存 JSON 到文件时出错 {file_path}: {e}")
+        return False
@@ -0,0 +1,239 @@
+# src/utils/memory.py
+import gc
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger('doc_crawler_utils')
+
+# cgroup 挂载点；v1 的 memory 控制器位于其下的 memory 子目录
+CGROUP_ROOT = '/sys/fs/cgroup'
+# cgroup v1 未设置上限时 memory.limit_in_bytes 为接近 2^63 的值
+_CGROUP_V1_UNLIMITED = 1 << 60
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _read_stat_value(path: str, key: str) -> int:
+    """读取 memory.stat 中某一项的值，不存在时返回 0"""
+    for line in (_read_text(path) or '').splitlines():
+        name, _, value = line.partition(' ')
+        if name == key:
+            try:
+                return int(value)
+            except ValueError:
+                return 0
+    return 0
+
+def _find_cgroup_dir(cgroup_root: str, proc_cgroup: str) -> Optional[Tuple[str, bool]]:
+    """
+    定位当前进程所在的 memory cgroup 目录
+
+    Returns:
+        (目录, 是否为 cgroup v2)，找不到时返回 None
+    """
+    for line in (_read_text(proc_cgroup) or '').splitlines():
+        parts = line.split(':', 2)
+        if len(parts) != 3:
+            continue
+        _, controllers, path = parts
+        if controllers == '':
+            candidates, marker, v2 = [cgroup_root], 'memory.current', True
+        elif 'memory' in controllers.split(','):
+            candidates, marker, v2 = [os.path.join(cgroup_root, 'memory')], 'memory.usage_in_bytes', False
+        else:
+            continue
+        # 容器内通常看到的是自己的 cgroup 根目录，宿主机上则需要拼接进程所在的路径
+        candidates.insert(0, candidates[0] + path.rstrip('/'))
+        for directory in candidates:
+            if os.path.exists(os.path.join(directory, marker)):
+                return directory, v2
+    return None
+
+def get_cgroup_memory_mb(cgroup_root: str = CGROUP_ROOT, proc_cgroup: str = '/proc/self/cgroup') -> Optional[float]:
+    """
+    获取当前 cgroup 的内存工作集（用量减去可回收的非活跃文件缓存），单位 MB
+
+    这是容器 OOM 判断所依据的数值，包含浏览器子进程在内的所有进程，共享页只计算一次。
+
+    Returns:
+        工作集（MB），cgroup 不存在或未设置内存上限时返回 None
+    """
+    found = _find_cgroup_dir(cgroup_root, proc_cgroup)
+    if found is None:
+        return None
+    directory, v2 = found
+    try:
+        if v2:
+            limit = _read_text(os.path.join(directory, 'memory.max'))
+            if limit is None or limit == 'max':
+                return None
+            usage = int(_read_text(os.path.join(directory, 'memory.current')) or '')
+            inactive_file = _read_stat_value(os.path.join(directory, 'memory.stat'), 'inactive_file')
+        else:
+            if int(_read_text(os.path.join(directory, 'memory.limit_in_bytes')) or '') >= _CGROUP_V1_UNLIMITED:
+                return None
+            usage = int(_read_text(os.path.join(directory, 'memory.usage_in_bytes')) or '')
+            inactive_file = _read_stat_value(os.path.join(directory, 'memory.stat'), 'total_inactive_file')
+    except ValueError:
+        return None
+    return max(usage - inactive_file, 0) / (1024 * 1024)
+
+def _read_ppid(pid: str) -> Optional[int]:
+    stat = _read_text(f'/proc/{pid}/stat')
+    try:
+        # 进程名可能包含空格和括号，ppid 是最后一个 ')' 之后的第二个字段
+        return int(stat.rsplit(')', 1)[1].split()[1])
+    except (AttributeError, ValueError, IndexError):
+        return None
+
+def _read_pss_kb(pid: int) -> int:
+    """读取进程的 PSS（共享页按共享进程数均摊），内核不支持 smaps_rollup 时退回 RSS"""
+    rollup = _read_text(f'/proc/{pid}/smaps_rollup')
+    if rollup is not None:
+        for line in rollup.splitlines():
+            if line.startswith('Pss:'):
+                return int(line.split()[1])
+        return 0
+    statm = _read_text(f'/proc/{pid}/statm')
+    try:
+        return int(statm.split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (AttributeError, ValueError, IndexError, OSError):
+        return 0
+
+def get_process_tree_pss_mb() -> Optional[float]:
+    """
+    获取当前进程及其所有子孙进程（如 crawl4ai 启动的 Chromium）的 PSS 之和，单位 MB
+
+    PSS 把共享页按共享进程数均摊，多个浏览器进程之间的共享内存不会被重复计算。
+
+    Returns:
+        PSS（MB），无法获取时（非 Linux）返回 None
+    """
+    try:
+        pids = [name for name in os.listdir('/proc') if name.isdigit()]
+    except OSError:
+        return None
+
+    children: Dict[int, List[int]] = {}
+    for pid in pids:
+        ppid = _read_ppid(pid)
+        if ppid is not None:
+            children.setdefault(ppid, []).append(int(pid))
+
+    total_kb = 0
+    stack = [os.getpid()]
+    while stack:
+        pid = stack.pop()
+        total_kb += _read_pss_kb(pid)
+        stack.extend(children.get(pid, []))
+    if total_kb == 0:
+        return None
+    return total_kb / 1024
+
+def get_memory_usage_mb() -> Tuple[Optional[float], str]:
+    """
+    获取爬虫的内存用量，单位 MB
+
+    在设置了内存上限的容器中读取 cgroup 工作集，否则对进程树的 PSS 求和。
+
+    Returns:
+        (用量, 来源)，来源为 'cgroup' 或 'pss'；无法获取时用量为 None
+    """
+    usage = get_cgroup_memory_mb()
+    if usage is not None:
+        return usage, 'cgroup'
+    return get_process_tree_pss_mb(), 'pss'
+
+class MemoryWatchdog:
+    """
+    定期采样内存用量（容器 cgroup 工作集，或进程树 PSS）：超过阈值时暂停抓取，回落到恢复阈值以下后继续，同时记录采样峰值
+    """
+    def __init__(self, max_rss_mb: float = 0, resume_ratio: float = 0.85, interval: float = 0.5, max_pause: float = 60.0):
+        """
+        Args:
+            max_rss_mb: 内存阈值（MB），为 0 时只记录峰值不暂停
+            resume_ratio: 内存回落到 max_rss_mb * resume_ratio 以下时恢复抓取
+            interval: 采样间隔（秒）
+            max_pause: 单次暂停的最长秒数，超过后强制恢复，避免内存无法回落时永久停顿
+        """
+        self.max_rss_mb = max_rss_mb
+        self.resume_ratio = resume_ratio
+        self.interval = interval
+        self.max_pause = max_pause
+        self._paused_at = 0.0
+        self.peak_memory_mb = 0.0
+        self.memory_source: Optional[str] = None
+        self._sample()
+        self.pause_count = 0
+        self.forced_resume_count = 0
+        self._ok = asyncio.Event()
+        self._ok.set()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def paused(self) -> bool:
+        return not self._ok.is_set()
+
+    def start(self) -> None:
+        """启动后台采样任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台采样任务并恢复所有等待的抓取"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._sample()
+        self._ok.set()
+
+    def _sample(self) -> Optional[float]:
+        usage, self.memory_source = get_memory_usage_mb()
+        if usage is not None:
+            self.peak_memory_mb = max(self.peak_memory_mb, usage)
+        return usage
+
+    async def _run(self) -> None:
+        while True:
+            usage = self._sample()
+            if usage is not None and self.max_rss_mb > 0:
+                now = time.monotonic()
+                if not self.paused and usage >= self.max_rss_mb:
+                    self.pause_count += 1
+                    self._paused_at = now
+                    self._ok.clear()
+                    logger.warning(f"内存用量 {usage:.0f} MB 超过阈值 {self.max_rss_mb:.0f} MB，暂停抓取")
+                    gc.collect()
+                elif self.paused and usage < self.max_rss_mb * self.resume_ratio:
+                    self._ok.set()
+                    logger.info(f"内存用量回落到 {usage:.0f} MB，恢复抓取")
+                elif self.paused and now - self._paused_at >= self.max_pause:
+                    self.forced_resume_count += 1
+                    self._ok.set()
+                    logger.warning(f"暂停超过 {self.max_pause:.0f} 秒内存仍为 {usage:.0f} MB，强制恢复抓取")
+            await asyncio.sleep(self.interval)
+
+    async def wait_until_ok(self) -> None:
+        """内存超过阈值时阻塞，直到回落到恢复阈值以下"""
+        await self._ok.wait()
+
+    def summary(self) -> dict:
+        """返回内存统计，用于运行报告"""
+        return {
+            'peak_memory_mb': round(self.peak_memory_mb, 1),
+            'memory_source': self.memory_source,
+            'max_rss_mb': self.max_rss_mb,
+            'pause_count': self.pause_count,
+            'forced_resume_count': self.forced_resume_count,
+        }
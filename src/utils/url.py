@@ -1,4 +1,5 @@
 # src/utils/url.py
+import asyncio
 import logging
 import requests
 from typing import List, Optional, Tuple, Set
@@ -37,25 +38,39 @@ def is_same_domain(url1: str, url2: str) -> bool:
     domain2 = urlparse(url2).netloc
     return domain1 == domain2
 
-async def get_urls_from_sitemap(base_url: str) -> List[str]:
+def get_sitemap_url(base_url: str) -> str:
+    """
+    获取网站 sitemap.xml 的地址
+    
+    Args:
+        base_url: 网站基础 URL
+        
+    Returns:
+        sitemap.xml 的完整 URL
+    """
+    parsed_url = urlparse(base_url)
+    return f"{parsed_url.scheme}://{parsed_url.netloc}/sitemap.xml"
+
+async def get_urls_from_sitemap(base_url: str, session: Optional[requests.Session] = None) -> List[str]:
     """
     从网站的 sitemap.xml 获取 URL 列表
     
     Args:
         base_url: 网站基础 URL
+        session: 可选的共享 HTTP 会话，用于复用连接
         
     Returns:
         从 sitemap 中提取的 URL 列表，如果无法获取则返回空列表
     """
-    parsed_url = urlparse(base_url)
-    domain = f"{parsed_url.scheme}://{parsed_url.netloc}"
-    sitemap_url = f"{domain}/sitemap.xml"
+    sitemap_url = get_sitemap_url(base_url)
     
     logger.info(f"Processing sitemap: {sitemap_url}")
     urls = []
     
     try:
-        response = requests.get(sitemap_url, timeout=10)
+        # 在线程中执行阻塞请求，避免批量模式下阻塞事件循环
+        http = session or requests
+        response = await asyncio.to_thread(http.get, sitemap_url, timeout=10)
         response.raise_for_status()
         
         # 解析 XML
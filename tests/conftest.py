@@ -0,0 +1,7 @@
+# tests/conftest.py
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径，使测试可以导入 src 包
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
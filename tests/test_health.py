@@ -0,0 +1,58 @@
+# tests/test_health.py
+import asyncio
+
+from src.crawler.health import CLOSED, HALF_OPEN, OPEN, HostHealthTracker, classify_failure, parse_retry_after
+
+def test_classify_failure():
+    assert classify_failure(status_code=503)
+    assert classify_failure(status_code=429)
+    assert not classify_failure(status_code=404)
+    assert classify_failure(error_message="net::ERR_TIMED_OUT at https://example.com")
+    assert classify_failure(error_message="net::ERR_EMPTY_RESPONSE")
+    assert classify_failure(exc=asyncio.TimeoutError())
+    assert not classify_failure(exc=RuntimeError("Target closed"))
+
+def test_parse_retry_after():
+    assert parse_retry_after({'Retry-After': '30'}) == 30.0
+    assert parse_retry_after({'retry-after': 'Wed, 21 Oct 2026 07:28:00 GMT'}) is None
+    assert parse_retry_after(None) is None
+
+def open_circuit(tracker, host):
+    for _ in range(tracker.failure_threshold):
+        tracker.record_transient_failure(host)
+    assert tracker._host(host).state == OPEN
+
+def test_circuit_opens_and_probe_success_closes_it():
+    async def main():
+        tracker = HostHealthTracker(failure_threshold=2, cooldown=0.05)
+        open_circuit(tracker, 'a.example.com')
+        assert await tracker.wait_available('a.example.com') is True
+        assert tracker._host('a.example.com').state == HALF_OPEN
+        tracker.record_success('a.example.com')
+        tracker.end_probe('a.example.com')
+        assert tracker._host('a.example.com').state == CLOSED
+        assert await tracker.wait_available('a.example.com') is False
+    asyncio.run(main())
+
+def test_cancelled_probe_releases_waiters():
+    async def main():
+        tracker = HostHealthTracker(failure_threshold=1, cooldown=0.0)
+        open_circuit(tracker, 'a.example.com')
+
+        async def probe_then_cancel():
+            probe = await tracker.wait_available('a.example.com')
+            try:
+                await asyncio.sleep(10)
+            finally:
+                if probe:
+                    tracker.end_probe('a.example.com')
+
+        probe_task = asyncio.create_task(probe_then_cancel())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(tracker.wait_available('a.example.com'))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        probe_task.cancel()
+        # 探测被取消后，等待的任务接替成为新的探测请求
+        assert await asyncio.wait_for(waiter, timeout=1) is True
+    asyncio.run(main())
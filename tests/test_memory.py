@@ -0,0 +1,73 @@
+# tests/test_memory.py
+import os
+
+import pytest
+
+from src.utils.memory import get_cgroup_memory_mb, get_process_tree_pss_mb
+
+MB = 1024 * 1024
+
+def write_files(directory, files):
+    os.makedirs(directory, exist_ok=True)
+    for name, content in files.items():
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(content)
+
+def write_proc_cgroup(tmp_path, content):
+    path = tmp_path / 'cgroup'
+    path.write_text(content)
+    return str(path)
+
+def test_cgroup_v2_working_set(tmp_path):
+    root = tmp_path / 'sys'
+    write_files(str(root), {
+        'memory.max': str(2048 * MB),
+        'memory.current': str(1200 * MB),
+        'memory.stat': f"anon {900 * MB}\ninactive_file {200 * MB}\nactive_file {100 * MB}\n",
+    })
+    proc_cgroup = write_proc_cgroup(tmp_path, "0::/\n")
+    assert get_cgroup_memory_mb(str(root), proc_cgroup) == 1000
+
+def test_cgroup_v2_nested_path(tmp_path):
+    root = tmp_path / 'sys'
+    write_files(str(root / 'crawler.slice'), {
+        'memory.max': str(1024 * MB),
+        'memory.current': str(300 * MB),
+        'memory.stat': "inactive_file 0\n",
+    })
+    proc_cgroup = write_proc_cgroup(tmp_path, "0::/crawler.slice\n")
+    assert get_cgroup_memory_mb(str(root), proc_cgroup) == 300
+
+def test_cgroup_v2_without_limit_is_ignored(tmp_path):
+    root = tmp_path / 'sys'
+    write_files(str(root), {'memory.max': 'max', 'memory.current': str(300 * MB), 'memory.stat': ''})
+    proc_cgroup = write_proc_cgroup(tmp_path, "0::/\n")
+    assert get_cgroup_memory_mb(str(root), proc_cgroup) is None
+
+def test_cgroup_v1_working_set(tmp_path):
+    root = tmp_path / 'sys'
+    write_files(str(root / 'memory'), {
+        'memory.limit_in_bytes': str(2048 * MB),
+        'memory.usage_in_bytes': str(800 * MB),
+        'memory.stat': f"inactive_file {10 * MB}\ntotal_inactive_file {300 * MB}\n",
+    })
+    proc_cgroup = write_proc_cgroup(tmp_path, "5:cpu,cpuacct:/\n4:memory:/docker/abc\n0::/\n")
+    assert get_cgroup_memory_mb(str(root), proc_cgroup) == 500
+
+def test_cgroup_v1_without_limit_is_ignored(tmp_path):
+    root = tmp_path / 'sys'
+    write_files(str(root / 'memory'), {
+        'memory.limit_in_bytes': '9223372036854771712',
+        'memory.usage_in_bytes': str(800 * MB),
+        'memory.stat': '',
+    })
+    proc_cgroup = write_proc_cgroup(tmp_path, "4:memory:/\n")
+    assert get_cgroup_memory_mb(str(root), proc_cgroup) is None
+
+def test_missing_cgroup_returns_none(tmp_path):
+    assert get_cgroup_memory_mb(str(tmp_path / 'missing'), str(tmp_path / 'missing_cgroup')) is None
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/stat'), reason="需要 Linux /proc")
+def test_process_tree_pss_is_positive():
+    usage = get_process_tree_pss_mb()
+    assert usage is not None and usage > 0
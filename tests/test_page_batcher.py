@@ -0,0 +1,124 @@
+# tests/test_page_batcher.py
+import re
+import asyncio
+
+from src.api.page_batcher import PageBatcher, build_batch_prompt, split_batch_response
+
+def wrap(page_id, content):
+    return f"<<<PAGE {page_id}>>>\n{content}\n<<<END {page_id}>>>"
+
+def test_build_batch_prompt_numbers_pages_in_order():
+    prompt = build_batch_prompt("指令\n", ["第一页", "第二页"])
+    assert prompt.startswith("指令\n")
+    assert "2 个相互独立的页面" in prompt
+    assert prompt.index("<<<PAGE 1>>>") < prompt.index("第一页") < prompt.index("<<<END 1>>>")
+    assert prompt.index("<<<END 1>>>") < prompt.index("<<<PAGE 2>>>") < prompt.index("第二页") < prompt.index("<<<END 2>>>")
+
+def test_split_batch_response_roundtrip():
+    response = "\n".join([wrap(1, "输出一"), wrap(2, "输出二")])
+    assert split_batch_response(response, 2) == {1: "输出一", 2: "输出二"}
+
+def test_split_batch_response_ignores_text_outside_markers():
+    response = "好的，以下是结果：\n" + wrap(1, "输出一") + "\n以上。"
+    assert split_batch_response(response, 1) == {1: "输出一"}
+
+def test_split_batch_response_drops_missing_and_out_of_range_ids():
+    response = "\n".join([wrap(1, "输出一"), wrap(3, "越界")])
+    assert split_batch_response(response, 2) == {1: "输出一"}
+
+def test_split_batch_response_drops_duplicated_ids():
+    response = "\n".join([wrap(1, "第一次"), wrap(1, "第二次"), wrap(2, "输出二")])
+    assert split_batch_response(response, 2) == {2: "输出二"}
+
+def test_split_batch_response_drops_empty_content():
+    response = "\n".join([wrap(1, "  "), wrap(2, "输出二")])
+    assert split_batch_response(response, 2) == {2: "输出二"}
+
+def test_split_batch_response_rejects_mismatched_and_nested_markers():
+    # 起止编号不一致的块不会被匹配
+    assert split_batch_response("<<<PAGE 1>>>\n输出\n<<<END 2>>>", 2) == {}
+    # 页面 1 缺少结束标记，内容中嵌入了页面 2 的起始标记
+    response = "<<<PAGE 1>>>\n输出一\n" + wrap(2, "输出二") + "\n<<<END 1>>>"
+    assert split_batch_response(response, 2) == {}
+
+def test_split_batch_response_handles_empty_response():
+    assert split_batch_response("", 3) == {}
+    assert split_batch_response(None, 3) == {}
+
+class FakeLLM:
+    """按标记回显页面的假 LLM，可指定批量响应中丢弃的页面编号"""
+    def __init__(self, drop_ids=()):
+        self.drop_ids = set(drop_ids)
+        self.prompts = []
+        self.routes = []
+
+    async def __call__(self, prompt, system=None, route_tokens=None, route_complexity=None):
+        self.prompts.append(prompt)
+        self.routes.append((route_tokens, route_complexity))
+        blocks = re.findall(r'<<<PAGE (\d+)>>>\n(.*?)\n<<<END \1>>>', prompt, re.DOTALL)
+        if not blocks:
+            return f"单页:{prompt.split(':', 1)[1]}"
+        return "\n".join(wrap(page_id, f"批量:{content}") for page_id, content in blocks if int(page_id) not in self.drop_ids)
+
+def run_pages(batcher, pages):
+    async def main():
+        results = await asyncio.gather(*(batcher.submit("指令:", page) for page in pages))
+        await batcher.flush_all()
+        return results
+    return asyncio.run(main())
+
+def test_batcher_packs_small_pages_into_one_request():
+    llm = FakeLLM()
+    batcher = PageBatcher(llm, max_wait=0.01)
+    assert run_pages(batcher, ["a", "b", "c"]) == ["批量:a", "批量:b", "批量:c"]
+    assert len(llm.prompts) == 1
+    assert batcher.stats['batch_requests'] == 1
+    assert batcher.stats['batched_pages'] == 3
+
+def test_batcher_respects_max_pages_per_batch():
+    llm = FakeLLM()
+    batcher = PageBatcher(llm, max_wait=0.01, max_pages_per_batch=2)
+    assert run_pages(batcher, ["a", "b", "c", "d", "e"]) == ["批量:a", "批量:b", "批量:c", "批量:d", "单页:e"]
+    assert batcher.stats['batch_requests'] == 2
+    assert batcher.stats['single_requests'] == 1
+
+def test_batcher_budget_counts_expected_output():
+    llm = FakeLLM()
+    page = "x" * 400  # 100 个输入 token
+    batcher = PageBatcher(llm, max_wait=0.01, token_budget=600, output_ratio=1.5)
+    # 每页占用 100 + 150 + 标记 = 270，预算内只能放下 2 页
+    assert batcher.page_cost(page) == 270
+    run_pages(batcher, [page] * 4)
+    assert batcher.stats['batch_requests'] == 2
+    assert batcher.stats['batched_pages'] == 4
+
+def test_batcher_falls_back_for_pages_missing_from_response():
+    llm = FakeLLM(drop_ids={2})
+    batcher = PageBatcher(llm, max_wait=0.01)
+    assert run_pages(batcher, ["a", "b", "c"]) == ["批量:a", "单页:b", "批量:c"]
+    assert batcher.stats['fallback_pages'] == 1
+
+def test_batcher_sends_large_pages_alone():
+    llm = FakeLLM()
+    batcher = PageBatcher(llm, max_wait=0.01, small_page_tokens=10)
+    assert run_pages(batcher, ["y" * 100]) == ["单页:" + "y" * 100]
+    assert batcher.stats['batch_requests'] == 0
+
+def test_batcher_routes_on_page_content_not_instruction():
+    llm = FakeLLM()
+    batcher = PageBatcher(llm, max_wait=0.01)
+
+    async def main():
+        return await asyncio.gather(batcher.submit("长指令" * 500 + ":", "a" * 40), batcher.submit("长指令" * 500 + ":", "b" * 80))
+    asyncio.run(main())
+    # 打包请求按最大页面路由，固定指令不计入
+    assert llm.routes == [(20, 0)]
+
+def test_batcher_uses_route_overrides_for_truncated_pages():
+    llm = FakeLLM()
+    batcher = PageBatcher(llm, max_wait=0.01, small_page_tokens=10)
+
+    async def main():
+        return await batcher.submit("指令:", "x" * 400, route_tokens=5000, route_complexity=1)
+    asyncio.run(main())
+    assert llm.routes == [(5000, 1)]
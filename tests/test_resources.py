@@ -0,0 +1,92 @@
+# tests/test_resources.py
+import time
+import asyncio
+
+from src.crawler.resources import CrawlResources
+from src.crawler.robots import RobotsCache
+
+class FakeSession:
+    def __init__(self, text):
+        self.text = text
+
+    def get(self, url, timeout=None):
+        response = type('Response', (), {})()
+        response.status_code = 200
+        response.text = self.text
+        return response
+
+def dispatch_times(resources, other_url, urls, delay, hold=0.3):
+    """一个其他主机的请求先占住全局槽位，返回 urls 中各请求实际发出的时间"""
+    async def main():
+        start = time.monotonic()
+        times = []
+
+        async def occupy():
+            async with resources.fetch_slot(other_url, delay=(0, 0)):
+                await asyncio.sleep(hold)
+
+        async def fetch(url):
+            async with resources.fetch_slot(url, delay=delay):
+                times.append(time.monotonic() - start)
+
+        await asyncio.gather(occupy(), *(fetch(url) for url in urls))
+        return sorted(times)
+    return asyncio.run(main())
+
+def test_host_interval_holds_after_waiting_for_global_slot():
+    resources = CrawlResources(max_concurrency=1, host_concurrency=2, batch_token_budget=0)
+    times = dispatch_times(resources, "https://other.example.com/", ["https://slow.example.com/1", "https://slow.example.com/2"], delay=(0.2, 0.2))
+    assert times[0] >= 0.3
+    assert times[1] - times[0] >= 0.19
+
+def test_crawl_delay_holds_after_waiting_for_global_slot(tmp_path):
+    robots = RobotsCache(cache_dir=str(tmp_path), session=FakeSession("User-agent: *\nCrawl-delay: 0.4\n"))
+    asyncio.run(robots.rules_for("https://slow.example.com/"))
+    resources = CrawlResources(max_concurrency=1, host_concurrency=2, batch_token_budget=0, robots=robots)
+    times = dispatch_times(resources, "https://other.example.com/", ["https://slow.example.com/1", "https://slow.example.com/2"], delay=(0, 0))
+    assert times[1] - times[0] >= 0.39
+
+class HangingCrawler:
+    async def arun(self, url, config=None, **kwargs):
+        await asyncio.sleep(10)
+
+def test_cancelled_probe_in_fetch_page_reopens_circuit():
+    async def main():
+        resources = CrawlResources(batch_token_budget=0, circuit_threshold=1, circuit_cooldown=0.0, rate_limit_delay=(0, 0))
+        resources.crawler = HangingCrawler()
+        resources.health.record_transient_failure("down.example.com")
+        task = asyncio.create_task(resources.fetch_page("https://down.example.com/page"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        state = resources.health._host("down.example.com")
+        assert state.state != "half_open"
+        assert state.probe_done.is_set()
+    asyncio.run(main())
+
+class OkCrawler:
+    async def arun(self, url, config=None, **kwargs):
+        return type('CrawlResult', (), {'success': True, 'status_code': 200})()
+
+def test_parked_tasks_release_task_slots():
+    async def main():
+        resources = CrawlResources(batch_token_budget=0, max_in_flight=2, circuit_threshold=1, circuit_cooldown=0.3, rate_limit_delay=(0, 0))
+        resources.crawler = OkCrawler()
+        resources.health.record_transient_failure("down.example.com")
+
+        async def run_in_slot(url):
+            await resources.task_slots.acquire()
+            try:
+                return await resources.fetch_page(url, holds_task_slot=True)
+            finally:
+                resources.task_slots.release()
+
+        parked = [asyncio.create_task(run_in_slot(f"https://down.example.com/{i}")) for i in range(2)]
+        await asyncio.sleep(0.05)
+        # 两个任务都在等待断路器冷却，槽位已归还，其他站点仍可获取
+        await asyncio.wait_for(resources.task_slots.acquire(), timeout=0.1)
+        resources.task_slots.release()
+        results = await asyncio.gather(*parked)
+        assert all(result is not None for result in results)
+        assert resources.task_slots._value == 2
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+# tests/test_robots.py
+import asyncio
+
+from src.crawler.robots import RobotsCache, RobotsRules, parse_robots_txt
+import src.crawler.robots as robots_module
+
+def test_longest_match_wins():
+    rules = parse_robots_txt("User-agent: *\nDisallow: /docs\nAllow: /docs/public\n", 'crawl-to-md')
+    assert not rules.allowed("https://example.com/docs/private")
+    assert rules.allowed("https://example.com/docs/public/page")
+    assert rules.allowed("https://example.com/blog")
+
+def test_allow_wins_on_equal_length():
+    rules = parse_robots_txt("User-agent: *\nDisallow: /page\nAllow: /page\n", 'crawl-to-md')
+    assert rules.allowed("https://example.com/page")
+
+def test_wildcard_and_end_anchor():
+    rules = parse_robots_txt("User-agent: *\nDisallow: /*.pdf$\nDisallow: /search*q=\n", 'crawl-to-md')
+    assert not rules.allowed("https://example.com/files/manual.pdf")
+    assert rules.allowed("https://example.com/files/manual.pdf.html")
+    assert not rules.allowed("https://example.com/search?q=test")
+    assert rules.allowed("https://example.com/search")
+
+def test_empty_disallow_allows_everything():
+    rules = parse_robots_txt("User-agent: *\nDisallow:\n", 'crawl-to-md')
+    assert rules.allowed("https://example.com/anything")
+
+def test_robots_txt_itself_is_always_allowed():
+    rules = parse_robots_txt("User-agent: *\nDisallow: /\n", 'crawl-to-md')
+    assert not rules.allowed("https://example.com/")
+    assert rules.allowed("https://example.com/robots.txt")
+
+def test_specific_group_overrides_wildcard_group():
+    content = (
+        "User-agent: *\nDisallow: /\n\n"
+        "User-agent: crawl-to-md\nDisallow: /private\nCrawl-delay: 5\n"
+    )
+    rules = parse_robots_txt(content, 'crawl-to-md')
+    assert rules.allowed("https://example.com/docs")
+    assert not rules.allowed("https://example.com/private/x")
+    assert rules.crawl_delay == 5.0
+    other = parse_robots_txt(content, 'other-bot')
+    assert not other.allowed("https://example.com/docs")
+    assert other.crawl_delay is None
+
+def test_groups_with_same_agent_are_merged():
+    content = (
+        "User-agent: crawl-to-md\nDisallow: /a\n\n"
+        "User-agent: *\nDisallow: /c\n\n"
+        "User-agent: crawl-to-md\nDisallow: /b\nCrawl-delay: 2\n"
+    )
+    rules = parse_robots_txt(content, 'crawl-to-md')
+    assert not rules.allowed("https://example.com/a")
+    assert not rules.allowed("https://example.com/b")
+    assert rules.allowed("https://example.com/c")
+    assert rules.crawl_delay == 2.0
+
+def test_multiple_agents_in_one_group():
+    content = "User-agent: other-bot\nUser-agent: *\nDisallow: /tmp\n"
+    rules = parse_robots_txt(content, 'crawl-to-md')
+    assert not rules.allowed("https://example.com/tmp/x")
+
+def test_comments_and_unknown_lines_are_ignored():
+    content = "# 注释\nUser-agent: * # 所有爬虫\nSitemap: https://example.com/sitemap.xml\nDisallow: /x # 禁止\n"
+    rules = parse_robots_txt(content, 'crawl-to-md')
+    assert not rules.allowed("https://example.com/x")
+    assert rules.allowed("https://example.com/y")
+
+def test_disallow_all_rules():
+    assert not RobotsRules(disallow_all=True).allowed("https://example.com/robots.txt")
+
+class FakeResponse:
+    def __init__(self, status_code, text=''):
+        self.status_code = status_code
+        self.text = text
+
+class FakeSession:
+    """按顺序返回预设响应的假 HTTP 会话，元素为异常时抛出"""
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, timeout=None):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+def test_cache_retries_unreachable_robots_txt(tmp_path, monkeypatch):
+    monkeypatch.setattr(robots_module, 'ROBOTS_RETRY_BACKOFF', 0.0)
+    session = FakeSession([OSError("connection reset"), FakeResponse(503), FakeResponse(200, "User-agent: *\nDisallow: /x\n")])
+    cache = RobotsCache(cache_dir=str(tmp_path), session=session)
+    assert asyncio.run(cache.allowed("https://example.com/y"))
+    assert not asyncio.run(cache.allowed("https://example.com/x"))
+    assert session.calls == 3
+    assert cache.unreachable_reason("https://example.com/") is None
+
+def test_cache_marks_origin_unreachable_after_retries(tmp_path, monkeypatch):
+    monkeypatch.setattr(robots_module, 'ROBOTS_RETRY_BACKOFF', 0.0)
+    session = FakeSession([FakeResponse(502)] * robots_module.ROBOTS_FETCH_ATTEMPTS)
+    cache = RobotsCache(cache_dir=str(tmp_path), session=session)
+    assert not asyncio.run(cache.allowed("https://example.com/y"))
+    assert cache.unreachable_reason("https://example.com/") == "HTTP 502"
+
+def test_cache_treats_4xx_as_no_rules_and_reuses_disk_cache(tmp_path):
+    cache = RobotsCache(cache_dir=str(tmp_path), session=FakeSession([FakeResponse(404)]))
+    assert asyncio.run(cache.allowed("https://example.com/anything"))
+    # 新实例从磁盘缓存读取，不再联网
+    fresh = RobotsCache(cache_dir=str(tmp_path), session=FakeSession([]))
+    assert asyncio.run(fresh.allowed("https://example.com/anything"))